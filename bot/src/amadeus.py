@@ -1,43 +1,97 @@
 import os
 import sys
+import signal
 import json
+import math
 from distutils.util import strtobool
 
 import discord
 from discord.ext import commands
 
 from components import exceptions as ex
-from helpers import strings, general, checks, startup
+from helpers import strings, general, checks, startup, roles, checkcache, cooldowns, schedules, stagestats, shadow, intake, requirements, cluster, ratelimits, dispatch, restarts, configwriter, journal, guildconfigs, configview
 from helpers.strings import InsertPosition
 
 
 def get_command_prefix(amadeus, message):
-    try:
-        return amadeus.config[str(message.guild.id)]["general"]["command_prefix"]
-    except (KeyError, AttributeError):
-        return "!"
+    # the matched prefix only, messages that passed the intake always have one
+    prefix = amadeus.intake.get_prefix(message)
+    return prefix if prefix is not None else list(amadeus.intake.get_trie(message).prefixes)
 
 
-intents = discord.Intents.all()
+# Intents and member caches are derived from what the extensions declare
+extension_requirements = requirements.collect(startup.get_extension_names())
+intents, member_cache_flags, chunk_guilds = requirements.resolve(extension_requirements.values())
+requirements.print_report(extension_requirements, intents, member_cache_flags, chunk_guilds)
 allowed_mentions = discord.AllowedMentions(everyone=False, roles=False)
 
-bot = commands.Bot(command_prefix=get_command_prefix, intents=intents, allowed_mentions=allowed_mentions)
+bot_options = dict(command_prefix=get_command_prefix, intents=intents, member_cache_flags=member_cache_flags,
+                   chunk_guilds_at_startup=chunk_guilds, allowed_mentions=allowed_mentions)
+# SHARD_COUNT "auto" or number of shards of the whole bot, SHARD_IDS comma separated shards run by this process
+shard_count = os.environ.get("SHARD_COUNT")
+shard_ids = os.environ.get("SHARD_IDS")
+if shard_count is None:
+    bot = commands.Bot(**bot_options)
+else:
+    bot = commands.AutoShardedBot(shard_count=None if shard_count == "auto" else int(shard_count),
+                                  shard_ids=[int(shard_id) for shard_id in shard_ids.split(",")] if shard_ids else None,
+                                  **bot_options)
 bot.dev_session = bool(strtobool(os.environ["DEV"]))
+# set by the coordinator for its workers, CLUSTER_ID is missing for processes only sharing rate limits
+bot.cluster = cluster.ClusterClient(bot, os.environ["CLUSTER_SOCKET"],
+                                    int(os.environ["CLUSTER_ID"]) if "CLUSTER_ID" in os.environ else None) \
+    if "CLUSTER_SOCKET" in os.environ else None
 bot.ready = False
+bot.ready_shards = set()
+bot.startup_task = None
+bot.missing_configs = []
 bot.corrupt_configs = []
 bot.app_info = None
+bot.intake = intake.Intake()
 bot.database_pool = None
+# set by database.base.init_session once a session validates, stays None without database
+bot.db_session = None
 bot.values = {}
-bot.config = {}
+bot.option_defaults = {}
+bot.compiled_limits = {}
+bot.role_indexes = {}
+bot.mod_masks = {}
+bot.disabled_categories = {}
+
+
+bot.previous_run = restarts.load_state(bot)
+bot.quiet_restart = False
 
 
 with open("values/config.json", 'r') as file:
     try:
-        bot.config["bot"] = json.load(file)
+        bot_config = json.load(file)
         print("Configuration file loaded successfully")
     except ValueError as e:
         raise SystemExit(e)
 
+# guild configs are loaded on first use, see startup_sequence for the store they are loaded from
+bot.config = guildconfigs.GuildConfigs(bot, **bot_config["guild_configs"])
+bot.config["bot"] = bot_config
+
+bot.check_cache = checkcache.CheckCache(**bot.config["bot"]["check_cache"])
+bot.cooldowns = cooldowns.TokenBucketStore(bot.config["bot"]["cooldowns"]["max_buckets"])
+bot.window_scheduler = schedules.WindowScheduler(bot)
+bot.stage_stats = stagestats.StageStats(checks.STAGE_NAMES, **bot.config["bot"]["check_stages"])
+bot.invocation_log = shadow.InvocationLog(**bot.config["bot"]["invocation_log"])
+bot.config_writer = configwriter.ConfigWriter(bot, **bot.config["bot"]["config_writer"])
+bot.journal = journal.Journal(bot, **bot.config["bot"]["journal"])
+
+roles.add_listeners(bot)
+checkcache.add_listeners(bot)
+stagestats.add_listeners(bot)
+shadow.add_listeners(bot)
+intake.add_listeners(bot)
+dispatch.add_listeners(bot)
+guildconfigs.add_listeners(bot)
+if bot.cluster is not None:
+    ratelimits.add_listeners(bot)
+
 
 @bot.check
 async def global_check(ctx):
@@ -45,34 +99,59 @@ async def global_check(ctx):
     return await checks.global_check(ctx, bot)
 
 
+@bot.before_invoke
+async def cooldown_check(ctx):
+    checks.record_invocation(ctx, bot)
+    await checks.check_cooldowns(ctx, bot)
+
+
+@bot.event
+async def on_message(message):
+    # prefixes of guilds whose config has never been loaded are not known yet
+    if message.guild is not None and message.guild.id not in bot.intake.guild_tries:
+        await bot.config.ensure(message.guild.id)
+    # drop bots and messages without prefix before discord.py builds a Context
+    if bot.intake.accept(message):
+        if message.guild is not None:
+            await bot.config.ensure(message.guild.id)
+        await bot.process_commands(message)
+
+
 @bot.event
 async def on_ready():
-    bot.ready = False
     print("Connected to Discord")
-    bot.app_info = await bot.application_info()
+    # sharded bots start up shard by shard in on_shard_ready
+    if not isinstance(bot, discord.AutoShardedClient):
+        await startup.shard_startup_sequence(bot, None)
+
 
+@bot.event
+async def on_shard_ready(shard_id):
+    print("Shard " + str(shard_id) + " connected to Discord")
     # entire startup sequence in its own helper
-    await startup.startup_sequence(bot)
+    await startup.shard_startup_sequence(bot, shard_id)
 
 
 @bot.event
 async def on_command_error(ctx, message):
     if isinstance(message, commands.CommandInvokeError):
-        bot_channel_id = await general.deep_get(bot.config, str(ctx.guild.id), "essential_channels", "bot_channel")
+        bot_channel_id = general.deep_get_sync(bot.config, str(ctx.guild.id), "essential_channels", "bot_channel")
         if bot_channel_id is not None:
             bot_channel = ctx.guild.get_channel(bot_channel_id)
             embed = await prepare_command_error_embed(ctx, message)
             if embed is not None:
                 await bot_channel.send(embed=embed)
     else:
-        error_config = None
+        # allowed invocations are recorded in before_invoke, where cooldowns are raised
+        if isinstance(message, commands.CheckFailure) and not isinstance(message, (ex.CategoryCooldown, ex.CommandCooldown)):
+            checks.record_invocation(ctx, bot)
+        error_config = {}
         if ctx.guild is not None:
-            error_config = await general.deep_get(bot.config, str(ctx.guild.id), "errors")
-        if error_config is None:
-            error_config = {}
+            error_config = configview.get_config_view(bot, ctx.guild.id).get_category("errors")
         if isinstance(message, commands.CommandNotFound) and error_config.get("hide_invalid_errors"):
             return
-        if isinstance(message, (ex.BotDisabled, ex.CategoryDisabled, ex.CommandDisabled)) and error_config.get(
+        if isinstance(message, (ex.BotDisabled, ex.CategoryDisabled, ex.CommandDisabled,
+                                ex.CategoryUnavailable, ex.CommandUnavailable)) and error_config.get(
                 "hide_disabled_errors"):
             return
         if isinstance(message,
@@ -82,6 +161,8 @@ async def on_command_error(ctx, message):
         if isinstance(message, (ex.CategoryNoWhitelistedRole, ex.CommandNoWhitelistedRole, ex.CategoryBlacklistedRole, ex.CommandBlacklistedRole)):
             if error_config.get("hide_role_errors"):
                 return
+        if isinstance(message, (ex.CategoryCooldown, ex.CommandCooldown)) and error_config.get("hide_cooldown_errors"):
+            return
         embed = await prepare_command_error_embed_custom(ctx, message, error_config)
         if embed is not None:
             await ctx.send(embed=embed)
@@ -128,10 +209,10 @@ async def prepare_command_error_embed_custom(ctx, message, error_config=None):
             string_combination = await strings.insert_into_string([bot.app_info.name], ex_string.description)
             embed.description = string_combination.string_combined
         elif isinstance(message, ex.NotGuildOwner):
-            string_combination = await strings.insert_into_string([ctx.guild.owner.mention], ex_string.description)
+            string_combination = await strings.insert_into_string(["<@" + str(ctx.guild.owner_id) + ">"], ex_string.description)
             embed.description = string_combination.string_combined
         elif isinstance(message, ex.BotNotConfigured):
-            string_combination = await strings.insert_into_string([bot.app_info.name, ctx.guild.owner.mention], ex_string.description, InsertPosition.LEFT)
+            string_combination = await strings.insert_into_string([bot.app_info.name, "<@" + str(ctx.guild.owner_id) + ">"], ex_string.description, InsertPosition.LEFT)
             embed.description = string_combination.string_combined
         elif isinstance(message, ex.BotDisabled):
             string_combination = await strings.insert_into_string([bot.app_info.name], ex_string.description, InsertPosition.LEFT)
@@ -146,6 +227,11 @@ async def prepare_command_error_embed_custom(ctx, message, error_config=None):
                 embed.description = await strings.append_roles(ex_string.description[0], message.role)
             else:
                 embed.description = ex_string.description[0]
+        elif isinstance(message, (ex.CategoryUnavailable, ex.CommandUnavailable)):
+            embed.description = await strings.append_roles(ex_string.description[0], message.windows)
+        elif isinstance(message, (ex.CategoryCooldown, ex.CommandCooldown)):
+            string_combination = await strings.insert_into_string([str(math.ceil(message.retry_after))], ex_string.description)
+            embed.description = string_combination.string_combined
         else:
             embed.description = ex_string.description[0]
     embed.set_footer(text=ctx.author.display_name, icon_url=ctx.author.avatar_url_as(static_format="png"))
@@ -158,4 +244,7 @@ if token == "":
     print("Could not read token file")
 else:
     print("Connecting to Discord...")
-    bot.run(token, bot=True, reconnect=True)
+    # instead of bot.run, whose signal handlers stop the loop without closing the bot
+    for shutdown_signal in (signal.SIGTERM, signal.SIGINT):
+        bot.loop.add_signal_handler(shutdown_signal, lambda: bot.loop.create_task(restarts.shutdown(bot)))
+    bot.loop.run_until_complete(bot.start(token, bot=True, reconnect=True))
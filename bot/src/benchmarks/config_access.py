@@ -0,0 +1,69 @@
+"""
+Per-invocation overhead of config lookups.
+
+Compares the previous reduce-based coroutine accessor with the current async wrapper,
+the synchronous accessor and a precompiled key path on a typical guild config lookup.
+
+Run from bot/src: python -m benchmarks.config_access
+"""
+import asyncio
+import time
+from functools import reduce
+
+from helpers import general
+
+ITERATIONS = 200_000
+
+CONFIG = {
+    str(100000000000000000 + i): {
+        "general": {"enabled": True, "language": "en", "style": "neutral", "command_prefix": "!"},
+        "limits": {"commands": {"config": {"roles": {"whitelist": [1, 2, 3]}}}}
+    } for i in range(1000)
+}
+GUILD_ID = "100000000000000500"
+
+
+async def deep_get_before(dictionary: dict, *keys):
+    # implementation before synchronous accessors were added
+    return reduce(lambda d, key: d.get(key) if d else None, keys, dictionary)
+
+
+async def bench_async(func) -> float:
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        await func(CONFIG, GUILD_ID, "general", "language")
+    return time.perf_counter() - start
+
+
+def bench_sync(func) -> float:
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        func(CONFIG, GUILD_ID, "general", "language")
+    return time.perf_counter() - start
+
+
+def bench_key_path() -> float:
+    path = general.compile_path("general", "language")
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        path(CONFIG.get(GUILD_ID))
+    return time.perf_counter() - start
+
+
+def main():
+    loop = asyncio.new_event_loop()
+    results = [
+        ("await deep_get (before)", loop.run_until_complete(bench_async(deep_get_before))),
+        ("await deep_get (wrapper)", loop.run_until_complete(bench_async(general.deep_get))),
+        ("deep_get_sync", bench_sync(general.deep_get_sync)),
+        ("compile_path", bench_key_path()),
+    ]
+    loop.close()
+    baseline = results[0][1]
+    print(f"{'accessor':<26}{'ns/call':>10}{'speedup':>10}")
+    for name, elapsed in results:
+        print(f"{name:<26}{elapsed / ITERATIONS * 1e9:>10.0f}{baseline / elapsed:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
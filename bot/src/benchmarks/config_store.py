@@ -0,0 +1,70 @@
+"""
+Load and save throughput of the config store backends at 10k guilds.
+
+Saves every guild one write at a time (as the ConfigWriter does for single guilds), saves all of them in
+one write_many (as on flush), loads every guild and lists all guilds (as on startup). PostgreSQL is not
+included, it needs a running database.
+
+Run from bot/src: python -m benchmarks.config_store
+"""
+import os
+import tempfile
+import time
+
+from helpers import configwriter
+from helpers.configstore import FileStore, SQLiteStore
+
+GUILDS = 10_000
+
+
+def make_config(index: int) -> dict:
+    return {
+        "general": {"enabled": True, "language": "en", "style": "neutral", "command_prefix": "!"},
+        "essential_channels": {"bot_channel": 700000000000000000 + index, "log_channel": 710000000000000000 + index},
+        "essential_roles": {"mod_role": [720000000000000000 + index], "admin_role": [730000000000000000 + index]},
+        "limits": {"commands": {"config": {"roles": {"whitelist": [1, 2, 3]}, "channels": {"blacklist": [4, 5]}}}}
+    }
+
+
+CONTENTS = {100000000000000000 + index: configwriter.serialize(make_config(index)) for index in range(GUILDS)}
+
+
+def bench(store) -> list:
+    start = time.perf_counter()
+    for guild_id, content in CONTENTS.items():
+        store.write(guild_id, content)
+    save_single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store.write_many(CONTENTS)
+    save_many = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for guild_id in CONTENTS:
+        store.read(guild_id)
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    assert len(store.guild_ids()) == GUILDS
+    list_ids = time.perf_counter() - start
+    return [("save single", save_single), ("save write_many", save_many), ("load", load), ("list", list_ids)]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "files"))
+        sqlite_store = SQLiteStore(os.path.join(directory, "configs.sqlite3"))
+        results = [
+            ("file", bench(FileStore(os.path.join(directory, "files") + "/"))),
+            ("sqlite", bench(sqlite_store)),
+        ]
+        sqlite_store.close()
+    print(f"{GUILDS} guilds, {sum(len(content) for content in CONTENTS.values()) / GUILDS:.0f} bytes per config")
+    print(f"{'backend':<10}{'operation':<18}{'seconds':>10}{'guilds/s':>12}")
+    for backend, timings in results:
+        for operation, elapsed in timings:
+            print(f"{backend:<10}{operation:<18}{elapsed:>10.3f}{GUILDS / elapsed:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 from components import exceptions as ex
+from helpers import moderators
 
 
 def is_guild_owner(ctx):
@@ -7,12 +8,24 @@ def is_guild_owner(ctx):
 
     Throws NotGuildOwner if false.
     """
-    if ctx.author != ctx.guild.owner:
+    if ctx.author.id != ctx.guild.owner_id:
         raise ex.NotGuildOwner
     else:
         return True
 
 
+def is_moderator(ctx):
+    """
+    Checks if context author has the guild's moderator role.
+
+    Throws NotModerator if false.
+    """
+    if ctx.guild is None or not moderators.is_moderator(ctx.bot, ctx.author):
+        raise ex.NotModerator
+    else:
+        return True
+
+
 def block_dms(ctx):
     """
     Checks if command is run in a DM.
@@ -35,3 +48,17 @@ def needs_database(ctx):
         raise ex.DatabaseNotConnected
     else:
         return True
+
+
+async def config_available(ctx):
+    """
+    Checks if the guild's config could be loaded, a guild whose load failed on a store error
+    has a config that is only not available right now.
+
+    Throws DatabaseNotConnected if not.
+    """
+    await ctx.bot.config.ensure(ctx.guild.id)
+    if ctx.bot.config.is_unavailable(ctx.guild.id):
+        raise ex.DatabaseNotConnected
+    else:
+        return True
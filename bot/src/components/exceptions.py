@@ -50,6 +50,15 @@ class NotGuildOwner(commands.CheckFailure):
         super().__init__(message)
 
 
+class NotModerator(commands.CheckFailure):
+    """
+    Thrown by is_moderator check if user does not have the moderator role.
+    """
+    def __init__(self):
+        message = "Not a moderator"
+        super().__init__(message)
+
+
 class BotNotConfigured(commands.CheckFailure):
     """
     Thrown when user tries to run any command while setup has not been run in the guild yet.
@@ -77,6 +86,24 @@ class CategoryDisabled(commands.CheckFailure):
         super().__init__(message)
 
 
+class CategoryUnavailable(commands.CheckFailure):
+    """
+    Thrown when category the command is part of is outside of its availability windows.
+
+    Includes the windows (UTC).
+    """
+    def __init__(self, windows: tuple):
+        """
+        Parameters
+        ----------
+        windows: tuple
+            Window strings, eg "mon-fri 18:00-22:00"
+        """
+        message = "Category unavailable"
+        self.windows = list(windows)
+        super().__init__(message)
+
+
 class CategoryNoWhitelistedRole(commands.CheckFailure):
     """
     Thrown when user does not have any of the whitelisted roles for a category.
@@ -126,6 +153,24 @@ class CommandDisabled(commands.CheckFailure):
         super().__init__(message, *args)
 
 
+class CommandUnavailable(commands.CheckFailure):
+    """
+    Thrown when command is outside of its availability windows.
+
+    Includes the windows (UTC).
+    """
+    def __init__(self, windows: tuple):
+        """
+        Parameters
+        ----------
+        windows: tuple
+            Window strings, eg "mon-fri 18:00-22:00"
+        """
+        message = "Command unavailable"
+        self.windows = list(windows)
+        super().__init__(message)
+
+
 class CommandNotWhitelistedChannel(commands.CheckFailure):
     """
     Thrown when command is run in a channel that is not part of the whitelist.
@@ -183,4 +228,38 @@ class CommandBlacklistedRole(commands.CheckFailure):
         self.role = role.name
         super().__init__(message)
 
-# TODO time exceptions
+
+class CategoryCooldown(commands.CheckFailure):
+    """
+    Thrown when a cooldown of the category the command is part of has no usages left.
+
+    Includes seconds until the category can be used again.
+    """
+    def __init__(self, retry_after: float):
+        """
+        Parameters
+        ----------
+        retry_after: float
+            Seconds until the next usage is available
+        """
+        message = "Category on cooldown"
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+class CommandCooldown(commands.CheckFailure):
+    """
+    Thrown when a cooldown of the command has no usages left.
+
+    Includes seconds until the command can be used again.
+    """
+    def __init__(self, retry_after: float):
+        """
+        Parameters
+        ----------
+        retry_after: float
+            Seconds until the next usage is available
+        """
+        message = "Command on cooldown"
+        self.retry_after = retry_after
+        super().__init__(message)
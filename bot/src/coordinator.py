@@ -0,0 +1,34 @@
+import os
+import asyncio
+
+import aiohttp
+
+from helpers import cluster
+
+
+async def get_recommended_shard_count(token: str) -> int:
+    async with aiohttp.ClientSession() as session:
+        async with session.get("https://discord.com/api/v8/gateway/bot",
+                               headers={"Authorization": "Bot " + token}) as response:
+            response.raise_for_status()
+            return (await response.json())["shards"]
+
+
+async def main():
+    cluster_count = int(os.environ["CLUSTER_COUNT"])
+    socket_path = os.environ.get("CLUSTER_SOCKET", "/tmp/amadeus-cluster.sock")
+    shard_count = os.environ.get("SHARD_COUNT", "auto")
+    if cluster_count == 0:
+        # only coordinates rate limits of bot processes started elsewhere
+        shard_count = 0
+        print("Running without workers")
+    else:
+        if shard_count == "auto":
+            with open("/run/secrets/bot-token") as token_file:
+                shard_count = await get_recommended_shard_count(token_file.read().strip())
+        shard_count = max(int(shard_count), cluster_count)
+        print("Running " + str(shard_count) + " shards in " + str(cluster_count) + " workers")
+    await cluster.Coordinator(shard_count, cluster_count, socket_path).run()
+
+
+asyncio.run(main())
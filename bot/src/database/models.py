@@ -1,6 +1,7 @@
 import enum
 
 from sqlalchemy import Column, ForeignKey, Integer, BigInteger, SmallInteger, String, DateTime, Enum
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, backref
 
@@ -65,3 +66,10 @@ class Name(Base):
     name_before = Column(String, nullable=False)
     name_after = Column(String, nullable=False)
     parent = relationship('User', backref=backref('Names', passive_deletes=True))
+
+
+class GuildConfig(Base):
+    __tablename__ = "guild_config"
+    guild_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    config = Column(JSONB, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
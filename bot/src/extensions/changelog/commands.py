@@ -4,6 +4,11 @@ from discord.ext.commands import Context
 from helpers import strings as s
 from components.amadeusPrompt import AmadeusPromptStatus
 from extensions.changelog.functions import changelog, addchangelog
+from helpers.requirements import Requirements
+
+
+# Prompts and menus, changelogs can be read in DMs
+REQUIREMENTS = Requirements(intents=frozenset({"guild_messages", "dm_messages", "guild_reactions", "dm_reactions"}))
 
 
 class Changelog(commands.Cog):
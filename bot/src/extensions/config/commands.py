@@ -1,5 +1,3 @@
-import copy
-
 import discord
 from discord.ext import commands
 from discord.ext.commands import Context
@@ -10,6 +8,12 @@ from extensions.config.enums import SetupType, SetupStatus
 from extensions.config.functions import config
 from extensions.config.functions import setup as setup_functions
 from extensions.config import helper as c
+from helpers import journal
+from helpers.requirements import Requirements
+
+
+# Prompts and menus
+REQUIREMENTS = Requirements(intents=frozenset({"guild_messages", "guild_reactions"}))
 
 
 class Config(commands.Cog):
@@ -29,6 +33,8 @@ class Config(commands.Cog):
     @commands.command(name='setup')
     @commands.check(checks.is_guild_owner)
     @commands.check(checks.block_dms)
+    # a guild whose config failed to load must not be set up as a new guild
+    @commands.check(checks.config_available)
     async def setup(self, ctx, setup_user: discord.Member = None):
         setup_emoji = ["✅", "🟦", "🟥"]
 
@@ -42,9 +48,6 @@ class Config(commands.Cog):
             embed = await setup_functions.prepare_status_embed(ctx, SetupStatus.CANCELLED)
             return await setup_type_selection.message.edit(embed=embed)
 
-        # copy current config to later apply if cancelled
-        backed_up_config = copy.deepcopy(self.bot.config.get(str(ctx.guild.id)))
-
         await setup_functions.initialise_guild_config(ctx, setup_type_selection.setup_type)
         all_successful_bool = await setup_functions.iterate_config_options(ctx, setup_user,
                                                                            setup_type_selection.message)
@@ -64,8 +67,9 @@ class Config(commands.Cog):
             embed = await setup_functions.check_bot_permissions(ctx, embed)
             embed = await setup_functions.add_configured_roles(ctx, embed)
             embed = await setup_functions.add_default_limits_to_embed(ctx, embed)
-        elif setup_status == SetupStatus.CANCELLED and setup_type_selection.setup_type == SetupType.REGULAR:
-            self.bot.config[str(ctx.guild.id)] = backed_up_config
+        else:
+            # changes made during the setup are not saved and reverted, those of other commands are kept
+            await self.bot.journal.discard(journal.get_batch(ctx))
         await setup_type_selection.message.edit(embed=embed)
 
 
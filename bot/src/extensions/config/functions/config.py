@@ -7,7 +7,7 @@ from components import amadeusMenu, amadeusPrompt
 from components.amadeusMenu import AmadeusMenuStatus, AmadeusMenu
 from components.amadeusPrompt import AmadeusPromptStatus, AmadeusPrompt
 from extensions.config import helper
-from helpers import strings as s, general
+from helpers import strings as s, general, intake
 from extensions.config.dataclasses import ConfigStep, InputData, InputType, ConfigStatus
 
 
@@ -194,7 +194,7 @@ async def __add_options_to_info(ctx: Context, menu: AmadeusMenu, option_full: di
 
 
 async def __add_footer(ctx: Context, input_data: InputData, menu: AmadeusMenu):
-    prefix = ctx.bot.config[str(ctx.guild.id)]["general"]["command_prefix"]
+    prefix = intake.primary_prefix(ctx.bot, ctx.guild.id)
     footer_text = prefix + ctx.command.name + " " + input_data.category
     if input_data.option is not None:
         footer_text = footer_text + " " + input_data.option
@@ -1,6 +1,3 @@
-import shutil
-from os.path import isfile
-
 import discord
 from discord.ext.commands import Context
 
@@ -11,7 +8,7 @@ from extensions.limits.dataclasses import InputData
 from extensions.limits.enums import OuterScope, EditType, InnerScope, ConfigType
 from extensions.config.dataclasses import SetupTypeSelection, UserInput
 from extensions.config.enums import SetupType, SetupInputType, SetupStatus
-from helpers import strings as s, general
+from helpers import strings as s, general, permissions, intake, configwriter, journal
 from extensions.config import helper as c
 from extensions.limits import helper as limits
 
@@ -26,10 +23,12 @@ async def prepare_setup_type_selection_menu(ctx: Context, setup_emoji: list) ->
     description = string_combination.string_combined
 
     # Different prompt if server has been configured before
-    # Backup current config to subdirectory
-    json_file = str(ctx.guild.id) + '.json'
-    if isfile('config/' + json_file):
-        shutil.copy('config/' + json_file, 'config/backup/' + json_file)
+    # Backup current config in the config store
+    # the snapshot alone may be behind the guild's journal, back up the config as it is now
+    guild_config = ctx.bot.config.get(str(ctx.guild.id))
+    if guild_config is not None:
+        await ctx.bot.loop.run_in_executor(None, ctx.bot.config.store.write_backup, ctx.guild.id,
+                                           configwriter.serialize(guild_config))
         string = await s.get_string(ctx, "setup", "server_configured_before")
         description += string.string
         emoji = [setup_emoji[1], setup_emoji[2]]
@@ -59,10 +58,11 @@ async def ask_for_setup_type(ctx: Context, menu: AmadeusMenu, setup_emoji: list)
 
 async def initialise_guild_config(ctx: Context, setup_type: SetupType):
     # delete config if reset emoji clicked
-    if setup_type == SetupType.FULL_RESET:
+    old_config = ctx.bot.config.get(str(ctx.guild.id))
+    if setup_type == SetupType.FULL_RESET or old_config is None:
         ctx.bot.config[str(ctx.guild.id)] = {}
-    else:
-        ctx.bot.config.setdefault(str(ctx.guild.id), {})
+        ctx.bot.journal.record(journal.get_batch(ctx), (), old_config, {}, ctx.author.id)
+    await permissions.compile_guild(ctx.bot, ctx.guild.id)
 
 
 async def iterate_config_options(ctx: Context, setup_user: discord.User, message: discord.Message) -> bool:
@@ -193,7 +193,7 @@ async def add_default_limits_to_embed(ctx: Context, embed: discord.Embed) -> dis
     for name_key in ctx.bot.values["limits"].get("defaults"):
         description += "• " + name_key + "\n"
     description_string_note = await s.get_string(ctx, "setup", "default_limits_note")
-    prefix = ctx.bot.config[str(ctx.guild.id)]["general"]["command_prefix"]
+    prefix = intake.primary_prefix(ctx.bot, ctx.guild.id)
     description_note_command = "`" + prefix + "limits`"
     inserted_string = await s.insert_into_string([description_note_command], description_string_note.list)
     description += "\n" + inserted_string.string_combined
@@ -1,5 +1,5 @@
+import copy
 import json
-import asyncio
 import shlex
 from distutils.util import strtobool
 
@@ -7,7 +7,8 @@ import discord
 from discord.ext import commands
 from discord.ext.commands import Context
 
-from helpers import strings as s, general
+from helpers import strings as s, general, permissions, journal
+from helpers.configview import compile_defaults, get_config_view
 from extensions.config.dataclasses import PreparedInput, ReturnType, ValidInput, Datatype, Config, InputType, ConfigStatus
 
 
@@ -32,13 +33,16 @@ async def load_values(bot: commands.bot) -> list:
                     failed.append(value)
         except FileNotFoundError as exc:
             failed.append(exc.filename)
+    if "options" in bot.values:
+        bot.option_defaults = compile_defaults(bot.values["options"])
+        bot.intake.compile_default(bot.option_defaults)
     return failed
 
 
 async def get_config(ctx: Context, category: str, name: str) -> Config:
     """
     Returns value of config item specified for the guild from context.
-    Returns default value if not set.
+    Returns default value if not set, without setting it.
 
     Parameters
     -----------
@@ -50,14 +54,12 @@ async def get_config(ctx: Context, category: str, name: str) -> Config:
         Name of the config option.
     """
     config = Config(category, name)
-    config_value = await general.deep_get(ctx.bot.config, str(ctx.guild.id), category, name)
+    config_view = get_config_view(ctx.bot, ctx.guild.id)
+    config_value = config_view.get_override(category, name)
     if config_value is None:
         # TODO what if no default value
-        default_value = await __get_default_config_value(ctx, category, name)
-        # Save default value to config
-        loop = asyncio.get_event_loop()
-        loop.create_task(set_config(ctx, PreparedInput(category, name, [default_value])))
-        config.value = default_value
+        default_value = config_view.get_default(category, name)
+        config.value = default_value if default_value is not None else ""
         config.return_type = ReturnType.DEFAULT_VALUE
     else:
         config.value = config_value
@@ -66,7 +68,7 @@ async def get_config(ctx: Context, category: str, name: str) -> Config:
 
 
 async def __get_default_config_value(ctx: Context, category: str, name: str) -> str:
-    return await general.deep_get_type(str, ctx.bot.values["options"], category, "list", name, "default")
+    return ctx.bot.option_defaults.get((category, name), "")
 
 
 async def get_valid_input(ctx: Context, category: str, name: str) -> ValidInput:
@@ -84,7 +86,7 @@ async def get_valid_input(ctx: Context, category: str, name: str) -> ValidInput:
         Name of the config option.
     """
     valid_input = ValidInput()
-    option = await general.deep_get_type(dict, ctx.bot.values["options"], category, "list", name)
+    option = general.deep_get_type_sync(dict, ctx.bot.values["options"], category, "list", name)
     data_type = option.get("data_type")
     valid_list = option.get("valid")
 
@@ -105,13 +107,13 @@ async def get_valid_input(ctx: Context, category: str, name: str) -> ValidInput:
         if data_type == "role":
             valid_input.datatype = Datatype.ROLE
             valid_input.input_type = InputType.TO_BE_CONVERTED
-            lang = await s.get_guild_language(ctx)
-            valid_input.valid_list = [await general.deep_get(datatype_dict, "name_descriptive", lang)]
+            lang = s.get_guild_language_sync(ctx)
+            valid_input.valid_list = [general.deep_get_sync(datatype_dict, "name_descriptive", lang)]
         if data_type == "channel":
             valid_input.datatype = Datatype.TEXT_CHANNEL
             valid_input.input_type = InputType.TO_BE_CONVERTED
-            lang = await s.get_guild_language(ctx)
-            valid_input.valid_list = [await general.deep_get(datatype_dict, "name_descriptive", lang)]
+            lang = s.get_guild_language_sync(ctx)
+            valid_input.valid_list = [general.deep_get_sync(datatype_dict, "name_descriptive", lang)]
     return valid_input
 
 
@@ -134,8 +136,12 @@ async def set_config(ctx: Context, prepared_input: PreparedInput, do_save: bool
         value = prepared_input.list[0]
     else:
         value = prepared_input.list
-    if await general.deep_get(ctx.bot.values["options"], prepared_input.category, "list", prepared_input.name) is not None:
-        ctx.bot.config[str(ctx.guild.id)].setdefault(prepared_input.category, {})[prepared_input.name] = value
+    if general.deep_get_sync(ctx.bot.values["options"], prepared_input.category, "list", prepared_input.name) is not None:
+        category_config = ctx.bot.config[str(ctx.guild.id)].setdefault(prepared_input.category, {})
+        ctx.bot.journal.record(journal.get_batch(ctx), (prepared_input.category, prepared_input.name),
+                               copy.deepcopy(category_config.get(prepared_input.name)), copy.deepcopy(value), ctx.author.id)
+        category_config[prepared_input.name] = value
+        await permissions.compile_guild(ctx.bot, ctx.guild.id)
         if do_save:
             save_successful = await save_config(ctx)
             prepared_input.status = ConfigStatus.SAVE_SUCCESS if save_successful else ConfigStatus.SAVE_FAIL
@@ -210,7 +216,7 @@ async def prepare_input(ctx: Context, category: str, name: str, user_input, no_s
 
 async def save_config(ctx: Context,) -> bool:
     """
-    Saves config of guild from ctx to json file.
+    Saves changes the invocation of ctx made to its guild's config by appending them to the guild's journal.
 
     Parameters
     -----------
@@ -218,21 +224,7 @@ async def save_config(ctx: Context,) -> bool:
         Invocation context, needed to determine guild.
     """
     if ctx.guild is not None:
-        json_file = 'config/' + str(ctx.guild.id) + '.json'
-        save_status = False
-        retries = 4
-        while save_status is False and retries > 0:
-            file = open(json_file, 'w')
-            try:
-                json.dump(ctx.bot.config[str(ctx.guild.id)], file, indent=4)
-                save_status = True
-            except Exception as e:
-                print(e)
-                await asyncio.sleep(1)
-            finally:
-                file.close()
-            retries -= 1
-        return True if save_status is True else False
+        return await ctx.bot.journal.commit(journal.get_batch(ctx))
     return False
 
 
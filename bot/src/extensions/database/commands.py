@@ -4,6 +4,10 @@ from discord.ext.commands import Context
 
 from helpers import startup
 from helpers.startup import DatabaseStatus
+from helpers.requirements import Requirements
+
+
+REQUIREMENTS = Requirements()
 
 
 class Database(commands.Cog):
@@ -0,0 +1,157 @@
+import time
+
+import discord
+from discord.ext import commands
+from discord.ext.commands import Context
+
+from components import checks as component_checks
+from helpers import checks, permissions
+from helpers.requirements import Requirements
+
+
+REQUIREMENTS = Requirements()
+
+
+class Diagnostics(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name='checkcache')
+    @commands.is_owner()
+    async def checkcache(self, ctx: Context):
+        check_cache = self.bot.check_cache
+        embed = discord.Embed()
+        embed.title = "Check cache"
+        embed.add_field(name="Hits", value=str(check_cache.hits))
+        embed.add_field(name="Misses", value=str(check_cache.misses))
+        embed.add_field(name="Hit rate", value=f"{check_cache.hit_rate():.1%}")
+        embed.add_field(name="Entries", value=f"{len(check_cache)}/{check_cache.max_size}")
+        embed.add_field(name="TTL", value=f"{check_cache.ttl}s")
+        embed.add_field(name="Invalidations", value=str(check_cache.invalidations))
+        await ctx.send(embed=embed)
+
+    @commands.command(name='checkstages')
+    @commands.is_owner()
+    async def checkstages(self, ctx: Context, guild_id: int = None):
+        stage_stats = self.bot.stage_stats
+        if guild_id is None:
+            guild_stats = stage_stats.guilds()
+        elif guild_id in self.bot.compiled_limits:
+            guild_stats = [stage_stats.get_guild(guild_id)]
+        else:
+            guild_stats = []
+
+        embed = discord.Embed()
+        embed.title = "Check stages"
+        embed.description = "Order: " + ("adaptive" if stage_stats.adaptive else "fixed")
+        checks = sum(stats.checks for stats in guild_stats)
+        calls = [sum(stats.calls[index] for stats in guild_stats) for index in range(len(stage_stats.stage_names))]
+        nanoseconds = sum(sum(stats.nanoseconds) for stats in guild_stats)
+        embed.add_field(name="Checks", value=str(checks))
+        embed.add_field(name="Stages per check", value=f"{sum(calls) / checks:.2f}" if checks > 0 else "-")
+        embed.add_field(name="Time per check", value=f"{nanoseconds / checks / 1000:.1f}µs" if checks > 0 else "-")
+
+        order = guild_stats[0].order if len(guild_stats) == 1 and stage_stats.adaptive else stage_stats.fixed_order
+        for index in order:
+            rejections = sum(stats.rejections[index] for stats in guild_stats)
+            stage_ns = sum(stats.nanoseconds[index] for stats in guild_stats)
+            if calls[index] > 0:
+                value = f"{calls[index]} calls\n{rejections / calls[index]:.1%} rejected\n{stage_ns / calls[index] / 1000:.1f}µs"
+            else:
+                value = "-"
+            embed.add_field(name=stage_stats.stage_names[index], value=value)
+        await ctx.send(embed=embed)
+
+    @commands.command(name='intake')
+    @commands.is_owner()
+    async def intake(self, ctx: Context):
+        report = self.bot.intake.report()
+        embed = discord.Embed()
+        embed.title = "Message intake"
+        embed.add_field(name="Received", value=str(report["received"]))
+        embed.add_field(name="Filtered", value=f"{report['filtered_fraction']:.1%}")
+        embed.add_field(name="Bots", value=str(report["filtered_bots"]))
+        embed.add_field(name="No prefix", value=str(report["filtered_prefix"]))
+        embed.add_field(name="Messages/s", value=f"{report['rate_total']:.2f}")
+        embed.add_field(name="Messages/s since last report", value=f"{report['rate_recent']:.2f}")
+        embed.add_field(name="Prefix tries", value=str(report["tries"]))
+        await ctx.send(embed=embed)
+
+    @commands.command(name='configwrites')
+    @commands.is_owner()
+    async def configwrites(self, ctx: Context):
+        config_writer = self.bot.config_writer
+        embed = discord.Embed()
+        embed.title = "Config writes"
+        embed.add_field(name="Pending", value=str(config_writer.pending))
+        embed.add_field(name="Written", value=str(config_writer.written))
+        embed.add_field(name="Unchanged", value=str(config_writer.skipped))
+        embed.add_field(name="Failed", value=str(config_writer.failed))
+        embed.add_field(name="Delay", value=f"{config_writer.delay_seconds}s")
+        await ctx.send(embed=embed)
+
+    @commands.command(name='configcache')
+    @commands.is_owner()
+    async def configcache(self, ctx: Context):
+        guild_configs = self.bot.config
+        embed = discord.Embed()
+        embed.title = "Config cache"
+        embed.add_field(name="Store", value=guild_configs.store.name)
+        embed.add_field(name="Loaded", value=f"{guild_configs.loaded}/{len(guild_configs) - 1}")
+        embed.add_field(name="Memory", value=f"{guild_configs.bytes / 1048576:.1f}/{guild_configs.max_bytes / 1048576:.1f} MiB")
+        embed.add_field(name="Loads", value=str(guild_configs.loads))
+        embed.add_field(name="Evictions", value=str(guild_configs.evictions))
+        await ctx.send(embed=embed)
+
+    @commands.command(name='explain')
+    @commands.check(component_checks.block_dms)
+    @commands.check_any(commands.is_owner(), commands.check(component_checks.is_moderator))
+    async def explain(self, ctx: Context, member: discord.Member, command_name: str,
+                      channel: discord.TextChannel = None):
+        command = self.bot.get_command(command_name)
+        if command is None:
+            raise commands.BadArgument(f"Command \"{command_name}\" not found")
+        channel = channel if channel is not None else ctx.channel
+
+        start = time.perf_counter_ns()
+        limits = permissions.compile_command(self.bot, ctx.guild.id, self.bot.config.get(str(ctx.guild.id)), command)
+        compile_us = (time.perf_counter_ns() - start) / 1000
+        subject = checks.CheckSubject(ctx.guild, channel, member)
+
+        embed = discord.Embed()
+        embed.title = f"{command.name} for {member.display_name} in #{channel.name}"
+        if limits.skip_global_check:
+            embed.description = "Allowed, command skips global check"
+            await ctx.send(embed=embed)
+            return
+
+        traces = checks.explain_limits(subject, self.bot, limits)
+        fired = next((trace for trace in traces if trace.result != "pass"), None)
+        if fired is None:
+            embed.description = "Allowed, no rule fired"
+        elif fired.result == "skip":
+            embed.description = f"Allowed, moderator skip\n`{fired.path}`"
+        else:
+            embed.description = f"Denied by {fired.name}: {type(fired.exception).__name__}\n`{fired.path}`"
+
+        total_us = compile_us
+        for trace in traces:
+            total_us += trace.microseconds
+            result = trace.result if trace.exception is None else type(trace.exception).__name__
+            marker = "➡️ " if trace is fired else ""
+            embed.add_field(name=marker + trace.name, value=f"{result}\n{trace.microseconds:.1f}µs\n`{trace.path}`")
+
+        now = time.monotonic()
+        cooldown_lines = []
+        for cooldown in limits.cooldowns:
+            retry_after = self.bot.cooldowns.retry_after(checks.cooldown_key(subject, cooldown), cooldown.rate,
+                                                         cooldown.per, now)
+            cooldown_lines.append(f"{cooldown.outer_scope}.{cooldown.name} {cooldown.bucket_type.value}: "
+                                  f"{cooldown.rate}/{cooldown.per}s, " + (f"{retry_after:.0f}s left" if retry_after > 0 else "available"))
+        embed.add_field(name="cooldowns", value="\n".join(cooldown_lines) if cooldown_lines else "-", inline=False)
+        embed.set_footer(text=f"Compile {compile_us:.1f}µs, total {total_us:.1f}µs")
+        await ctx.send(embed=embed)
+
+
+def setup(bot):
+    bot.add_cog(Diagnostics(bot))
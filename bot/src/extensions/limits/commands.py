@@ -4,6 +4,11 @@ from discord.ext.commands import Context
 from components import checks
 from extensions.limits.dataclasses import InputData
 from extensions.limits.functions import limits
+from helpers.requirements import Requirements
+
+
+# Prompts and menus
+REQUIREMENTS = Requirements(intents=frozenset({"guild_messages", "guild_reactions"}))
 
 
 class Limits(commands.Cog):
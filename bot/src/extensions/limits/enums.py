@@ -11,6 +11,7 @@ class LimitStep(Enum):
     VALUES = 6
     PREPARED = 7
     FINISHED = 8
+    PREVIEWED = 9
 
 
 class OuterScope(Enum):
@@ -22,11 +23,16 @@ class InnerScope(Enum):
     ENABLED = 0
     ROLE = 1
     CHANNEL = 2
+    COOLDOWN = 3
+    SCHEDULE = 4
 
 
 class ConfigType(Enum):
     WHITELIST = 0
     BLACKLIST = 1
+    PER_USER = 2
+    PER_CHANNEL = 3
+    PER_GUILD = 4
 
 
 class EditType(Enum):
@@ -43,4 +49,6 @@ class LimitStatus(Enum):
     ROLE_NOT_FOUND = 3
     PREPARATION_SUCCESSFUL = 4
     SAVE_SUCCESS = 5
-    SAVE_FAIL = 6
\ No newline at end of file
+    SAVE_FAIL = 6
+    COOLDOWN_INVALID = 7
+    SCHEDULE_INVALID = 8
\ No newline at end of file
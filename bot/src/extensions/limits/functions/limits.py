@@ -1,3 +1,4 @@
+import copy
 from collections import defaultdict
 from typing import Union
 
@@ -10,7 +11,7 @@ from extensions.config.helper import save_config
 from extensions.limits.dataclasses import InputData, PreparedInput
 from extensions.limits.enums import InnerScope, LimitStep, OuterScope, ConfigType, EditType, LimitStatus
 from extensions.limits import helper
-from helpers import strings as s, general
+from helpers import strings as s, general, permissions, moderators, shadow
 
 
 async def check_input(ctx: Context, args, input_data: InputData) -> InputData:
@@ -30,10 +31,16 @@ async def check_input(ctx: Context, args, input_data: InputData) -> InputData:
                                 input_data.values = args[3]
                                 input_data.limit_step = LimitStep.VALUES
                                 return input_data
-                            config_type = await __get_config_type(args[3])
+                            if input_data.inner_scope == InnerScope.SCHEDULE:
+                                return await __check_schedule_input(args[3:], input_data)
+                            config_type = await __get_config_type(args[3], input_data.inner_scope)
                             if config_type is not None:
                                 input_data.config_type = config_type
-                                if len(args) > 4:
+                                if len(args) > 4 and input_data.inner_scope == InnerScope.COOLDOWN:
+                                    input_data.edit_type = EditType.REPLACE
+                                    input_data.values = args[4:]
+                                    input_data.limit_step = LimitStep.VALUES
+                                elif len(args) > 4:
                                     edit_type = await __get_edit_type(args[4])
                                     if edit_type is not None:
                                         input_data.edit_type = edit_type
@@ -51,6 +58,8 @@ async def check_input(ctx: Context, args, input_data: InputData) -> InputData:
                         else:
                             if input_data.inner_scope == InnerScope.ENABLED:
                                 input_data.limit_step = LimitStep.EDIT_TYPE
+                            elif input_data.inner_scope == InnerScope.SCHEDULE:
+                                input_data.limit_step = LimitStep.CONFIG_TYPE
                             else:
                                 input_data.limit_step = LimitStep.INNER_SCOPE
                     else:
@@ -66,6 +75,25 @@ async def check_input(ctx: Context, args, input_data: InputData) -> InputData:
     return input_data
 
 
+async def __check_schedule_input(args, input_data: InputData) -> InputData:
+    # schedules have no config type, edit type follows inner scope directly
+    edit_type = await __get_edit_type(args[0])
+    if edit_type is None:
+        input_data.limit_step = LimitStep.CONFIG_TYPE
+    elif edit_type == EditType.RESET:
+        input_data.edit_type = edit_type
+        input_data.prepared_values = []
+        input_data.limit_step = LimitStep.PREPARED
+    elif len(args) > 1:
+        input_data.edit_type = edit_type
+        input_data.values = args[1:]
+        input_data.limit_step = LimitStep.VALUES
+    else:
+        input_data.edit_type = edit_type
+        input_data.limit_step = LimitStep.EDIT_TYPE
+    return input_data
+
+
 async def collect_limits_data(ctx: Context, input_data: InputData):
     while input_data.limit_step is not LimitStep.FINISHED:
         if input_data.limit_step == LimitStep.NO_INFO:
@@ -85,6 +113,8 @@ async def collect_limits_data(ctx: Context, input_data: InputData):
         elif input_data.limit_step == LimitStep.VALUES:
             await __process_input(ctx, input_data)
         elif input_data.limit_step == LimitStep.PREPARED:
+            await __preview_limits(ctx, input_data)
+        elif input_data.limit_step == LimitStep.PREVIEWED:
             await __save_limits(ctx, input_data)
 
 
@@ -115,11 +145,22 @@ async def __get_inner_scope(user_input: str) -> InnerScope:
         return InnerScope.CHANNEL
     elif user_input in ["enabled", "enable", "on"]:
         return InnerScope.ENABLED
+    elif user_input in ["cooldown", "cooldowns", "cd"]:
+        return InnerScope.COOLDOWN
+    elif user_input in ["schedule", "schedules", "availability", "hours"]:
+        return InnerScope.SCHEDULE
 
 
-async def __get_config_type(user_input: str) -> ConfigType:
+async def __get_config_type(user_input: str, inner_scope: InnerScope) -> ConfigType:
     user_input = user_input.lower()
-    if user_input in ["whitelist", "white list", "wl", "allow list", "allowlist", "al"]:
+    if inner_scope == InnerScope.COOLDOWN:
+        if user_input in ["user", "per_user", "member"]:
+            return ConfigType.PER_USER
+        elif user_input in ["channel", "per_channel"]:
+            return ConfigType.PER_CHANNEL
+        elif user_input in ["guild", "per_guild", "server"]:
+            return ConfigType.PER_GUILD
+    elif user_input in ["whitelist", "white list", "wl", "allow list", "allowlist", "al"]:
         return ConfigType.WHITELIST
     elif user_input in ["blacklist", "black list", "bl", "deny list", "denylist", "dl"]:
         return ConfigType.BLACKLIST
@@ -214,27 +255,37 @@ async def __ask_for_inner_scope(ctx: Context, input_data: InputData):
     string = await s.get_string(ctx, "limits", "role_s")
     string_desc = await s.get_string(ctx, "limits", "role_desc")
     await menu.add_option(string.string, string_desc.string)
+    inner_scopes = [InnerScope.ENABLED, InnerScope.ROLE]
     if input_data.outer_scope != OuterScope.CATEGORY:
         string = await s.get_string(ctx, "limits", "channel_s")
         string_desc = await s.get_string(ctx, "limits", "channel_desc")
         await menu.add_option(string.string, string_desc.string)
+        inner_scopes.append(InnerScope.CHANNEL)
+    string = await s.get_string(ctx, "limits", "cooldown")
+    string_desc = await s.get_string(ctx, "limits", "cooldown_desc")
+    await menu.add_option(string.string, string_desc.string)
+    inner_scopes.append(InnerScope.COOLDOWN)
+    string = await s.get_string(ctx, "limits", "schedule")
+    string_desc = await s.get_string(ctx, "limits", "schedule_desc")
+    await menu.add_option(string.string, string_desc.string)
+    inner_scopes.append(InnerScope.SCHEDULE)
     await __add_current_values(ctx, input_data, menu)
 
     menu_data = await __show_menu_and_check_result(ctx, menu, input_data)
     if menu_data.status == AmadeusMenuStatus.SELECTED:
         input_data.message = menu_data.message
-        if menu_data.reaction_index == 0:
-            input_data.inner_scope = InnerScope.ENABLED
+        input_data.inner_scope = inner_scopes[menu_data.reaction_index]
+        if input_data.inner_scope == InnerScope.ENABLED:
             input_data.limit_step = LimitStep.EDIT_TYPE
+        elif input_data.inner_scope == InnerScope.SCHEDULE:
+            input_data.limit_step = LimitStep.CONFIG_TYPE
         else:
             input_data.limit_step = LimitStep.INNER_SCOPE
-        if menu_data.reaction_index == 1:
-            input_data.inner_scope = InnerScope.ROLE
-        elif menu_data.reaction_index == 2:
-            input_data.inner_scope = InnerScope.CHANNEL
 
 
 async def __ask_for_config_type(ctx: Context, input_data: InputData):
+    if input_data.inner_scope == InnerScope.COOLDOWN:
+        return await __ask_for_bucket_type(ctx, input_data)
     title = await __get_menu_title(ctx, input_data)
     menu = AmadeusMenu(ctx.bot, title)
     await menu.set_user_specific(True)
@@ -271,6 +322,26 @@ async def __ask_for_config_type(ctx: Context, input_data: InputData):
             input_data.config_type = ConfigType.BLACKLIST
 
 
+async def __ask_for_bucket_type(ctx: Context, input_data: InputData):
+    title = await __get_menu_title(ctx, input_data)
+    menu = AmadeusMenu(ctx.bot, title)
+    await menu.set_user_specific(True)
+
+    config_types = [ConfigType.PER_USER, ConfigType.PER_CHANNEL, ConfigType.PER_GUILD]
+    for config_type in config_types:
+        string = await s.get_string(ctx, "limits", config_type.name.lower())
+        string_desc = await s.get_string(ctx, "limits", config_type.name.lower() + "_desc")
+        await menu.add_option(string.string, string_desc.string)
+
+    await __add_current_values(ctx, input_data, menu)
+
+    menu_data = await __show_menu_and_check_result(ctx, menu, input_data)
+    if menu_data.status == AmadeusMenuStatus.SELECTED:
+        input_data.limit_step = LimitStep.CONFIG_TYPE
+        input_data.message = menu_data.message
+        input_data.config_type = config_types[menu_data.reaction_index]
+
+
 async def __ask_for_edit_type(ctx: Context, input_data):
     title = await __get_menu_title(ctx, input_data)
 
@@ -279,31 +350,27 @@ async def __ask_for_edit_type(ctx: Context, input_data):
 
     await __add_current_values(ctx, input_data, menu)
 
-    string = await s.get_string(ctx, "limits", "add")
-    string_desc = await s.get_string(ctx, "limits", "add_desc")
-    await menu.add_option(string.string, string_desc.string)
-    string = await s.get_string(ctx, "limits", "remove")
-    string_desc = await s.get_string(ctx, "limits", "remove_desc")
-    await menu.add_option(string.string, string_desc.string)
-    string = await s.get_string(ctx, "limits", "replace")
-    string_desc = await s.get_string(ctx, "limits", "replace_desc")
-    await menu.add_option(string.string, string_desc.string)
-    string = await s.get_string(ctx, "limits", "reset")
-    string_desc = await s.get_string(ctx, "limits", "reset_desc")
-    await menu.add_option(string.string, string_desc.string)
+    # cooldowns are a single value, they can only be replaced or reset
+    if input_data.inner_scope == InnerScope.COOLDOWN:
+        edit_types = [EditType.REPLACE, EditType.RESET]
+    else:
+        edit_types = [EditType.ADD, EditType.REMOVE, EditType.REPLACE, EditType.RESET]
+    for edit_type in edit_types:
+        string = await s.get_string(ctx, "limits", edit_type.name.lower())
+        string_desc = await s.get_string(ctx, "limits", edit_type.name.lower() + "_desc")
+        await menu.add_option(string.string, string_desc.string)
 
     menu_data = await __show_menu_and_check_result(ctx, menu, input_data)
     if menu_data.status == AmadeusMenuStatus.SELECTED:
         input_data.limit_step = LimitStep.EDIT_TYPE
         input_data.message = menu_data.message
-        if menu_data.reaction_index == 0:
-            input_data.edit_type = EditType.ADD
-        elif menu_data.reaction_index == 1:
-            input_data.edit_type = EditType.REMOVE
-        elif menu_data.reaction_index == 2:
-            input_data.edit_type = EditType.REPLACE
-        elif menu_data.reaction_index == 3:
-            input_data.edit_type = EditType.RESET
+        input_data.edit_type = edit_types[menu_data.reaction_index]
+        if input_data.inner_scope == InnerScope.COOLDOWN and input_data.edit_type == EditType.RESET:
+            input_data.values = "0"
+            input_data.limit_step = LimitStep.VALUES
+        elif input_data.inner_scope == InnerScope.SCHEDULE and input_data.edit_type == EditType.RESET:
+            input_data.prepared_values = []
+            input_data.limit_step = LimitStep.PREPARED
 
 
 async def __ask_for_enable(ctx: Context, input_data: InputData):
@@ -330,7 +397,11 @@ async def __ask_for_values(ctx: Context, input_data: InputData):
     title = await __get_menu_title(ctx, input_data)
     prompt = AmadeusPrompt(ctx.bot, title)
     desc_string = None
-    if input_data.edit_type == EditType.ADD:
+    if input_data.inner_scope == InnerScope.COOLDOWN:
+        desc_string = await s.get_string(ctx, "limits", "cooldown_values_desc")
+    elif input_data.inner_scope == InnerScope.SCHEDULE:
+        desc_string = await s.get_string(ctx, "limits", "schedule_values_desc")
+    elif input_data.edit_type == EditType.ADD:
         desc_string = await s.get_string(ctx, "limits", "add_desc")
     elif input_data.edit_type == EditType.REMOVE:
         desc_string = await s.get_string(ctx, "limits", "remove_desc")
@@ -360,6 +431,48 @@ async def __process_input(ctx: Context, input_data: InputData):
             await __show_limit_status(ctx, input_data, LimitStatus.ROLE_NOT_FOUND)
         elif input_data.inner_scope == InnerScope.CHANNEL:
             await __show_limit_status(ctx, input_data, LimitStatus.TEXT_CHANNEL_NOT_FOUND)
+        elif input_data.inner_scope == InnerScope.COOLDOWN:
+            await __show_limit_status(ctx, input_data, LimitStatus.COOLDOWN_INVALID)
+        elif input_data.inner_scope == InnerScope.SCHEDULE:
+            await __show_limit_status(ctx, input_data, LimitStatus.SCHEDULE_INVALID)
+
+
+async def __preview_limits(ctx: Context, input_data: InputData):
+    # Replay recorded invocations against the change before it is saved, skipped if nothing was recorded
+    log = ctx.bot.invocation_log
+    if log.count(ctx.guild.id) == 0:
+        input_data.limit_step = LimitStep.PREVIEWED
+        return
+
+    guild_config = ctx.bot.config[str(ctx.guild.id)]
+    proposed_config = copy.deepcopy(guild_config)
+    await helper.apply_limit(proposed_config, input_data)
+    # up to a million invocations, replayed in the executor on copies the log cannot change meanwhile
+    window = [(bucket, counter.copy()) for bucket, counter in log.window(ctx.guild.id, log.hours)]
+    report = await ctx.bot.loop.run_in_executor(None, shadow.replay, window,
+                                                permissions.compile_config(ctx.bot, ctx.guild.id, guild_config),
+                                                permissions.compile_config(ctx.bot, ctx.guild.id, proposed_config),
+                                                moderators.get_mod_mask(ctx.bot, ctx.guild.id))
+
+    title = await __get_menu_title(ctx, input_data)
+    menu = AmadeusMenu(ctx.bot, title)
+    await menu.set_user_specific(True)
+    string = await s.get_string(ctx, "limits", "preview_desc")
+    await menu.set_description(string.string + " " + str(log.hours) + "h")
+    string = await s.get_string(ctx, "limits", "preview_replayed")
+    await menu.add_field(string.string, str(report.invocations))
+    for title_key, flips in (("preview_newly_denied", report.newly_denied), ("preview_newly_allowed", report.newly_allowed)):
+        string = await s.get_string(ctx, "limits", title_key)
+        flips_str = "\n".join(name + ": " + str(count) for name, count in flips.most_common(10))
+        await menu.add_field(string.string, flips_str if len(flips_str) > 0 else "-")
+    string = await s.get_string(ctx, "limits", "save")
+    string_desc = await s.get_string(ctx, "limits", "save_desc")
+    await menu.add_option(string.string, string_desc.string)
+
+    menu_data = await __show_menu_and_check_result(ctx, menu, input_data)
+    if menu_data.status == AmadeusMenuStatus.SELECTED:
+        input_data.message = menu_data.message
+        input_data.limit_step = LimitStep.PREVIEWED
 
 
 async def __save_limits(ctx: Context, input_data: InputData):
@@ -444,6 +557,12 @@ async def __show_limit_status(ctx: Context, input_data: InputData, status: Limit
     elif status == LimitStatus.ROLE_NOT_FOUND:
         string = await s.get_string(ctx, "config_status", "ROLE_NOT_FOUND")
         string_desc = await s.get_string(ctx, "config_status", "ROLE_NOT_FOUND_DESC")
+    elif status == LimitStatus.COOLDOWN_INVALID:
+        string = await s.get_string(ctx, "limits_status", "COOLDOWN_INVALID")
+        string_desc = await s.get_string(ctx, "limits_status", "COOLDOWN_INVALID_DESC")
+    elif status == LimitStatus.SCHEDULE_INVALID:
+        string = await s.get_string(ctx, "limits_status", "SCHEDULE_INVALID")
+        string_desc = await s.get_string(ctx, "limits_status", "SCHEDULE_INVALID_DESC")
     elif status == LimitStatus.SAVE_SUCCESS:
         string = await s.get_string(ctx, "limits_status", "SAVE_SUCCESS")
     else:
@@ -475,6 +594,11 @@ async def __add_current_values(ctx: Context, input_data: InputData, menu: Union[
         await __add_field_to_menu(ctx, input_data, menu, InnerScope.ROLE, ConfigType.WHITELIST)
     if await __check_field_role_blacklist(input_data):
         await __add_field_to_menu(ctx, input_data, menu, InnerScope.ROLE, ConfigType.BLACKLIST)
+    for config_type in [ConfigType.PER_USER, ConfigType.PER_CHANNEL, ConfigType.PER_GUILD]:
+        if await __check_field_cooldown(input_data, config_type):
+            await __add_cooldown_field_to_menu(ctx, input_data, menu, config_type)
+    if await __check_field_schedule(input_data):
+        await __add_schedule_field_to_menu(ctx, input_data, menu)
 
 
 async def __check_field_enabled(input_data: InputData) -> bool:
@@ -506,6 +630,36 @@ async def __check_field_role_blacklist(input_data: InputData) -> bool:
            or input_data.inner_scope == InnerScope.ROLE and input_data.config_type == ConfigType.BLACKLIST
 
 
+async def __check_field_cooldown(input_data: InputData, config_type: ConfigType) -> bool:
+    return input_data.config_type is None and input_data.inner_scope is None \
+           or input_data.config_type is None and input_data.inner_scope == InnerScope.COOLDOWN \
+           or input_data.inner_scope == InnerScope.COOLDOWN and input_data.config_type == config_type
+
+
+async def __check_field_schedule(input_data: InputData) -> bool:
+    return input_data.inner_scope is None or input_data.inner_scope == InnerScope.SCHEDULE
+
+
+async def __add_cooldown_field_to_menu(ctx: Context, input_data: InputData, menu: Union[AmadeusMenu, AmadeusPrompt],
+                                       config_type: ConfigType):
+    inner_scope_str = await s.get_string(ctx, "limits", "cooldown")
+    config_type_str = await s.get_string(ctx, "limits", config_type.name.lower())
+    title = inner_scope_str.string.capitalize() + " " + config_type_str.string
+    cooldown = await __get_cooldown(ctx, input_data, config_type)
+    if cooldown.get("rate") is not None and cooldown.get("per") is not None:
+        await menu.add_field(title, str(cooldown["rate"]) + " / " + str(cooldown["per"]) + "s")
+    else:
+        await menu.add_field(title, "-")
+
+
+async def __add_schedule_field_to_menu(ctx: Context, input_data: InputData, menu: Union[AmadeusMenu, AmadeusPrompt]):
+    inner_scope_str = await s.get_string(ctx, "limits", "schedule")
+    outer_scope_str = await helper.get_outer_scope_str(input_data)
+    windows = general.deep_get_type_sync(list, ctx.bot.config, str(ctx.guild.id), "limits", outer_scope_str,
+                                         input_data.name.lower(), "schedule")
+    await menu.add_field(inner_scope_str.string + " (UTC)", "\n".join(windows) if len(windows) > 0 else "-")
+
+
 async def __add_field_to_menu(ctx: Context, input_data: InputData, menu: AmadeusMenu, inner_scope: InnerScope,
                               config_type: ConfigType = None):
     inner_scope_str = await s.get_string(ctx, "limits", inner_scope.name.lower())
@@ -537,11 +691,18 @@ async def __get_list(ctx: Context, input_data: InputData, inner_scope: InnerScop
     inner_scope_str = await helper.get_inner_scope_str(inner_scope)
     config_type_str = await helper.get_config_type_str(config_type)
     if inner_scope == InnerScope.ENABLED:
-        return await general.deep_get_type(list, ctx.bot.config, str(ctx.guild.id), "limits", outer_scope_str,
-                                           input_data.name.lower(), inner_scope_str)
+        return general.deep_get_type_sync(list, ctx.bot.config, str(ctx.guild.id), "limits", outer_scope_str,
+                                          input_data.name.lower(), inner_scope_str)
     else:
-        return await general.deep_get_type(list, ctx.bot.config, str(ctx.guild.id), "limits", outer_scope_str,
-                                           input_data.name.lower(), inner_scope_str, config_type_str)
+        return general.deep_get_type_sync(list, ctx.bot.config, str(ctx.guild.id), "limits", outer_scope_str,
+                                          input_data.name.lower(), inner_scope_str, config_type_str)
+
+
+async def __get_cooldown(ctx: Context, input_data: InputData, config_type: ConfigType) -> dict:
+    outer_scope_str = await helper.get_outer_scope_str(input_data)
+    config_type_str = await helper.get_config_type_str(config_type)
+    return general.deep_get_type_sync(dict, ctx.bot.config, str(ctx.guild.id), "limits", outer_scope_str,
+                                      input_data.name.lower(), "cooldowns", config_type_str)
 
 
 async def __show_menu_and_check_result(ctx: Context, menu: AmadeusMenu,
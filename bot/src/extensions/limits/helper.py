@@ -8,11 +8,14 @@ from discord.ext.commands import Context
 
 from extensions.limits.dataclasses import PreparedInput, InputData
 from extensions.limits.enums import InnerScope, EditType, OuterScope, ConfigType
+from helpers import permissions, schedules, intake, general, journal
+from helpers.cooldowns import BucketType
 
 
 async def prepare_input(ctx: Context, inner_scope: InnerScope, user_input: Union[str, list], get_name: bool = False) -> PreparedInput:
     """
     Goes through every element and converts it to role or channel.
+    Cooldowns are converted to usages and timeframe in seconds, schedules to window strings.
 
     Parameters
     ----------
@@ -44,6 +47,27 @@ async def prepare_input(ctx: Context, inner_scope: InnerScope, user_input: Union
             prepared_input.successful = False
         return prepared_input
 
+    if inner_scope == InnerScope.COOLDOWN:
+        # usages and timeframe in seconds, a single 0 removes the cooldown
+        try:
+            values = [int(item) for item in user_input]
+        except ValueError:
+            values = []
+        if len(values) == 2 and values[0] > 0 and values[1] > 0:
+            prepared_input.list = values
+        elif values != [0]:
+            prepared_input.successful = False
+        return prepared_input
+
+    if inner_scope == InnerScope.SCHEDULE:
+        # stored windows contain a space, eg "mon-fri 18:00-22:00"
+        windows = schedules.parse_windows([token for item in user_input for token in item.split()])
+        if windows is not None:
+            prepared_input.list = windows
+        else:
+            prepared_input.successful = False
+        return prepared_input
+
     for item in user_input:
         try:
             if inner_scope == InnerScope.ROLE:
@@ -66,25 +90,56 @@ async def prepare_input(ctx: Context, inner_scope: InnerScope, user_input: Union
 
 async def set_limit(ctx: Context, input_data: InputData):
     """
-    Iterates config dictionaries and sets given limit.
+    Sets given limit in the guild's config and recompiles the guild's limits.
 
     Parameters
     ----------
     ctx: Context
     input_data: InputData
     """
-    ctx.bot.config[str(ctx.guild.id)].setdefault("limits", {})
+    guild_config = ctx.bot.config[str(ctx.guild.id)]
+    path = ("limits", await get_outer_scope_str(input_data), input_data.name)
+    old = copy.deepcopy(general.deep_get_sync(guild_config, *path))
+    await apply_limit(guild_config, input_data)
+    ctx.bot.journal.record(journal.get_batch(ctx), path, old, copy.deepcopy(general.deep_get_sync(guild_config, *path)), ctx.author.id)
+    await permissions.compile_guild(ctx.bot, ctx.guild.id)
+
+
+async def apply_limit(guild_config: dict, input_data: InputData):
+    """
+    Iterates config dictionaries and sets given limit.
+    Works on any guild config, eg a copy for previewing a change.
+
+    Parameters
+    ----------
+    guild_config: dict
+    input_data: InputData
+    """
+    guild_config.setdefault("limits", {})
     outer_scope_str = await get_outer_scope_str(input_data)
-    ctx.bot.config[str(ctx.guild.id)]["limits"].setdefault(outer_scope_str, {})
-    ctx.bot.config[str(ctx.guild.id)]["limits"][outer_scope_str].setdefault(input_data.name, {})
+    guild_config["limits"].setdefault(outer_scope_str, {})
+    limits_name = guild_config["limits"][outer_scope_str].setdefault(input_data.name, {})
     if input_data.inner_scope == InnerScope.ENABLED:
-        ctx.bot.config[str(ctx.guild.id)]["limits"][outer_scope_str][input_data.name].setdefault("enabled", input_data.prepared_values[0])
-        ctx.bot.config[str(ctx.guild.id)]["limits"][outer_scope_str][input_data.name]["enabled"] = input_data.prepared_values[0]
+        limits_name["enabled"] = input_data.prepared_values[0]
         return
     inner_scope_str = await get_inner_scope_str(input_data)
-    ctx.bot.config[str(ctx.guild.id)]["limits"][outer_scope_str][input_data.name].setdefault(inner_scope_str, {})
+    if input_data.inner_scope == InnerScope.SCHEDULE:
+        # list of windows directly, there is no config type
+        limits_name[inner_scope_str] = await __edit_list(limits_name.get(inner_scope_str, []), input_data)
+        return
+    limits_inner = limits_name.setdefault(inner_scope_str, {})
     config_type_str = await get_config_type_str(input_data)
-    current_list = ctx.bot.config[str(ctx.guild.id)]["limits"][outer_scope_str][input_data.name][inner_scope_str].setdefault(config_type_str, [])
+    if input_data.inner_scope == InnerScope.COOLDOWN:
+        if input_data.edit_type == EditType.RESET or len(input_data.prepared_values) == 0:
+            limits_inner.pop(config_type_str, None)
+        else:
+            limits_inner[config_type_str] = {"rate": input_data.prepared_values[0], "per": input_data.prepared_values[1]}
+        return
+    current_list = limits_inner.setdefault(config_type_str, [])
+    limits_inner[config_type_str] = await __edit_list(current_list, input_data)
+
+
+async def __edit_list(current_list: list, input_data: InputData) -> list:
     if input_data.edit_type == EditType.ADD:
         for item in input_data.prepared_values:
             if item not in current_list:
@@ -93,11 +148,11 @@ async def set_limit(ctx: Context, input_data: InputData):
         for item in input_data.prepared_values:
             if item in current_list:
                 current_list.remove(item)
-    elif input_data.edit_type.REPLACE:
+    elif input_data.edit_type == EditType.REPLACE:
         current_list = input_data.prepared_values
-    elif input_data.edit_type.RESET:
+    elif input_data.edit_type == EditType.RESET:
         current_list = []
-    ctx.bot.config[str(ctx.guild.id)]["limits"][outer_scope_str][input_data.name][inner_scope_str][config_type_str] = current_list
+    return current_list
 
 
 async def get_footer_text(ctx: Context, input_data: InputData) -> str:
@@ -116,7 +171,7 @@ async def get_footer_text(ctx: Context, input_data: InputData) -> str:
     -------
     Footer string
     """
-    prefix = ctx.bot.config[str(ctx.guild.id)]["general"]["command_prefix"]
+    prefix = intake.primary_prefix(ctx.bot, ctx.guild.id)
     footer_text = prefix + ctx.command.name.lower()
     if input_data.outer_scope is not None:
         footer_text += " " + input_data.outer_scope.name.lower()
@@ -132,7 +187,7 @@ async def get_footer_text(ctx: Context, input_data: InputData) -> str:
         return footer_text
     if input_data.config_type is not None:
         footer_text += " " + input_data.config_type.name.lower()
-    else:
+    elif input_data.inner_scope != InnerScope.SCHEDULE:
         return footer_text
     if input_data.edit_type is not None:
         footer_text += " " + input_data.edit_type.name.lower()
@@ -175,6 +230,10 @@ async def get_inner_scope_str(input_data: Union[InputData, InnerScope]) -> str:
         inner_scope_str = "channels"
     elif inner_scope == InnerScope.ROLE:
         inner_scope_str = "roles"
+    elif inner_scope == InnerScope.COOLDOWN:
+        inner_scope_str = "cooldowns"
+    elif inner_scope == InnerScope.SCHEDULE:
+        inner_scope_str = "schedule"
     return inner_scope_str
 
 
@@ -196,6 +255,12 @@ async def get_config_type_str(input_data: Union[InputData, ConfigType]):
         config_type_str = "whitelist"
     elif config_type == ConfigType.BLACKLIST:
         config_type_str = "blacklist"
+    elif config_type == ConfigType.PER_USER:
+        config_type_str = BucketType.USER.value
+    elif config_type == ConfigType.PER_CHANNEL:
+        config_type_str = BucketType.CHANNEL.value
+    elif config_type == ConfigType.PER_GUILD:
+        config_type_str = BucketType.GUILD.value
     return config_type_str
 
 
@@ -0,0 +1,172 @@
+from array import array
+from collections import OrderedDict
+from typing import Optional
+
+import discord
+
+# estimated size of a record without its content: object with slots plus bytes header
+RECORD_OVERHEAD = 160
+# estimated size of a channel without its records
+CHANNEL_OVERHEAD = 400
+
+
+class BufferedMessage:
+    """
+    What is kept of a message to log its deletion or edit later. Creation time is part of the ID.
+    """
+    __slots__ = ("id", "author_id", "content", "count_attachments", "count_embeds", "count_mentions")
+
+    def __init__(self, message_id: int, author_id: int, content: bytes, count_attachments: int, count_embeds: int,
+                 count_mentions: int):
+        self.id = message_id
+        self.author_id = author_id
+        self.content = content
+        self.count_attachments = count_attachments
+        self.count_embeds = count_embeds
+        self.count_mentions = count_mentions
+
+    @classmethod
+    def from_message(cls, message: discord.Message):
+        return cls(message.id, message.author.id, message.content.encode(), len(message.attachments),
+                   len(message.embeds), len(message.raw_mentions))
+
+    def size(self) -> int:
+        return RECORD_OVERHEAD + len(self.content)
+
+
+class ChannelBuffer:
+    """
+    Ring of the most recent messages of a channel.
+
+    Message IDs are kept in an array next to the records. Messages arrive in order of their IDs,
+    so lookups are binary searches over the ring. A channel that ever received an older message
+    after a newer one falls back to linear search.
+    """
+    __slots__ = ("guild_id", "capacity", "ids", "records", "start", "length", "ordered", "bytes")
+
+    def __init__(self, guild_id: int, capacity: int):
+        self.guild_id = guild_id
+        self.capacity = capacity
+        self.ids = array("Q", bytes(8 * capacity))
+        self.records = [None] * capacity
+        self.start = 0
+        self.length = 0
+        self.ordered = True
+        self.bytes = CHANNEL_OVERHEAD + 16 * capacity
+
+    def append(self, record: BufferedMessage) -> int:
+        """
+        Returns change of the buffer's size in bytes.
+        """
+        before = self.bytes
+        if self.length > 0 and record.id < self.ids[(self.start + self.length - 1) % self.capacity]:
+            self.ordered = False
+        if self.length == self.capacity:
+            evicted = self.records[self.start]
+            if evicted is not None:
+                self.bytes -= evicted.size()
+            position = self.start
+            self.start = (self.start + 1) % self.capacity
+        else:
+            position = (self.start + self.length) % self.capacity
+            self.length += 1
+        self.ids[position] = record.id
+        self.records[position] = record
+        self.bytes += record.size()
+        return self.bytes - before
+
+    def position_of(self, message_id: int) -> Optional[int]:
+        if self.ordered:
+            low, high = 0, self.length
+            while low < high:
+                middle = (low + high) // 2
+                if self.ids[(self.start + middle) % self.capacity] < message_id:
+                    low = middle + 1
+                else:
+                    high = middle
+            position = (self.start + low) % self.capacity
+            if low < self.length and self.ids[position] == message_id:
+                return position
+            return None
+        for offset in range(self.length):
+            position = (self.start + offset) % self.capacity
+            if self.ids[position] == message_id:
+                return position
+        return None
+
+    def get(self, message_id: int) -> Optional[BufferedMessage]:
+        position = self.position_of(message_id)
+        return self.records[position] if position is not None else None
+
+    def replace(self, message_id: int, record: Optional[BufferedMessage]) -> int:
+        """
+        Replaces record of message, eg after an edit, None removes it.
+        Returns change of the buffer's size in bytes.
+        """
+        position = self.position_of(message_id)
+        if position is None or self.records[position] is None:
+            return 0
+        before = self.bytes
+        self.bytes -= self.records[position].size()
+        self.records[position] = record
+        if record is not None:
+            self.bytes += record.size()
+        return self.bytes - before
+
+
+class MessageBuffer:
+    """
+    Recent messages of all channels, kept to log deletions and edits of messages
+    that are no longer in discord.py's message cache.
+
+    Every channel keeps its last messages_per_channel messages. If all channels together exceed
+    max_bytes, the channels that have been idle the longest are dropped as a whole.
+    """
+    def __init__(self, messages_per_channel: int, max_bytes: int):
+        self.messages_per_channel = messages_per_channel
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evicted_channels = 0
+        # least recently written channel first
+        self.__channels = OrderedDict()
+
+    def __len__(self):
+        return len(self.__channels)
+
+    def add(self, message: discord.Message):
+        channel_buffer = self.__channels.get(message.channel.id)
+        if channel_buffer is None:
+            channel_buffer = self.__channels[message.channel.id] = ChannelBuffer(message.guild.id, self.messages_per_channel)
+            self.bytes += channel_buffer.bytes
+        else:
+            self.__channels.move_to_end(message.channel.id)
+        self.bytes += channel_buffer.append(BufferedMessage.from_message(message))
+        while self.bytes > self.max_bytes and len(self.__channels) > 1:
+            channel_id, evicted = self.__channels.popitem(last=False)
+            self.bytes -= evicted.bytes
+            self.evicted_channels += 1
+
+    def get(self, channel_id: int, message_id: int) -> Optional[BufferedMessage]:
+        channel_buffer = self.__channels.get(channel_id)
+        return channel_buffer.get(message_id) if channel_buffer is not None else None
+
+    def replace(self, channel_id: int, message_id: int, record: Optional[BufferedMessage]):
+        channel_buffer = self.__channels.get(channel_id)
+        if channel_buffer is not None:
+            self.bytes += channel_buffer.replace(message_id, record)
+
+    def pop(self, channel_id: int, message_id: int) -> Optional[BufferedMessage]:
+        record = self.get(channel_id, message_id)
+        if record is not None:
+            self.replace(channel_id, message_id, None)
+        return record
+
+    def remove_channel(self, channel_id: int):
+        channel_buffer = self.__channels.pop(channel_id, None)
+        if channel_buffer is not None:
+            self.bytes -= channel_buffer.bytes
+
+    def remove_guild(self, guild_id: int):
+        for channel_id in [channel_id for channel_id, channel_buffer in self.__channels.items()
+                           if channel_buffer.guild_id == guild_id]:
+            self.remove_channel(channel_id)
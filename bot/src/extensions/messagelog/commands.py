@@ -0,0 +1,97 @@
+import discord
+from discord.ext import commands
+
+from database.models import MessageEventType
+from extensions.messagelog.buffer import MessageBuffer, BufferedMessage
+from extensions.messagelog.writer import MessageLogWriter
+from helpers import dispatch
+from helpers.requirements import Requirements
+
+
+REQUIREMENTS = Requirements(intents=frozenset({"guild_messages"}))
+
+
+class MessageLog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        if not hasattr(bot, "message_buffer"):
+            bot.message_buffer = MessageBuffer(**bot.config["bot"]["message_buffer"])
+        if not hasattr(bot, "message_log"):
+            bot.message_log = MessageLogWriter(bot, **bot.config["bot"]["message_log"])
+
+    def cog_unload(self):
+        self.bot.loop.create_task(self.bot.message_log.flush())
+
+    @dispatch.listener()
+    async def on_message(self, message: discord.Message):
+        if message.guild is not None and not message.author.bot:
+            self.bot.message_buffer.add(message)
+
+    @dispatch.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        if payload.guild_id is not None:
+            cached = [payload.cached_message] if payload.cached_message is not None else []
+            await self.log_deletions(payload.guild_id, payload.channel_id, [payload.message_id], cached)
+
+    @dispatch.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        if payload.guild_id is not None:
+            await self.log_deletions(payload.guild_id, payload.channel_id, list(payload.message_ids),
+                                     payload.cached_messages)
+
+    async def log_deletions(self, guild_id: int, channel_id: int, message_ids: list, cached_messages: list):
+        """
+        Logs deletion of messages of one channel, resolving all of them in one pass:
+        discord.py's cache first, then the buffer, then a single query for the rest.
+        Messages found nowhere are not logged.
+        """
+        records = {message.id: BufferedMessage.from_message(message) for message in cached_messages
+                   if not message.author.bot}
+        # cached bot messages are not buffered either
+        skipped = {message.id for message in cached_messages if message.author.bot}
+        missing = []
+        for message_id in message_ids:
+            record = self.bot.message_buffer.pop(channel_id, message_id)
+            if record is not None:
+                records.setdefault(message_id, record)
+            elif message_id not in records and message_id not in skipped:
+                missing.append(message_id)
+        records.update(await self.bot.message_log.fetch(missing))
+        for record in records.values():
+            self.bot.message_log.add(guild_id, channel_id, record, MessageEventType.DELETE)
+
+    @dispatch.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        data = payload.data
+        # embed unfurls and other updates without content, and messages of bots
+        if "content" not in data or "guild_id" not in data or "author" not in data or data["author"].get("bot"):
+            return
+        content = data["content"].encode()
+        guild_id = int(data["guild_id"])
+        buffered = self.bot.message_buffer.get(payload.channel_id, payload.message_id)
+        if buffered is not None:
+            before = buffered.content
+        elif payload.cached_message is not None:
+            before = payload.cached_message.content.encode()
+        else:
+            logged = (await self.bot.message_log.fetch([payload.message_id])).get(payload.message_id)
+            before = logged.content if logged is not None else None
+        if before == content:
+            return
+        record = BufferedMessage(payload.message_id, int(data["author"]["id"]), content,
+                                 len(data.get("attachments", [])), len(data.get("embeds", [])),
+                                 len(data.get("mentions", [])))
+        self.bot.message_buffer.replace(payload.channel_id, payload.message_id, record)
+        self.bot.message_log.add(guild_id, payload.channel_id, record, MessageEventType.EDIT, before)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        self.bot.message_buffer.remove_channel(channel.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.bot.message_buffer.remove_guild(guild.id)
+
+
+def setup(bot):
+    bot.add_cog(MessageLog(bot))
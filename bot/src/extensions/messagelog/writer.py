@@ -0,0 +1,120 @@
+import asyncio
+import datetime
+from typing import Optional
+
+import discord
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from database.models import Message, User, MessageEventType
+from extensions.messagelog.buffer import BufferedMessage
+
+
+class MessageLogWriter:
+    """
+    Collects logged deletions and edits and writes them in batches.
+
+    Rows are keyed by message ID, so several events of one message between two flushes become a
+    single row. Every flush is one upsert of users and one upsert of messages, run in the default
+    executor because the database session is synchronous. Rows are dropped if the database is not connected.
+    """
+    def __init__(self, bot, flush_seconds: float, max_batch: int):
+        self.bot = bot
+        self.flush_seconds = flush_seconds
+        self.max_batch = max_batch
+        self.written = 0
+        self.dropped = 0
+        self.__pending = {}
+        self.__task = None
+
+    def add(self, guild_id: int, channel_id: int, record: BufferedMessage, event_type: MessageEventType,
+            before: Optional[bytes] = None):
+        """
+        Queues deletion or edit of message. Edits pass the new content in record and the previous one as before.
+        """
+        pending = self.__pending.get(record.id)
+        if pending is not None and pending["before"] is not None:
+            # keep content from before the first edit of this batch
+            before = pending["before"].encode()
+        self.__pending[record.id] = {
+            "id": record.id,
+            "guild_id": guild_id,
+            "channel_id": channel_id,
+            "user_id": record.author_id,
+            "created_at": discord.utils.snowflake_time(record.id),
+            "content": record.content.decode(),
+            "count_mentions": record.count_mentions,
+            "count_attachments": record.count_attachments,
+            "count_embeds": record.count_embeds,
+            "event_type": event_type,
+            "event_at": datetime.datetime.utcnow(),
+            "before": before.decode() if before is not None else None
+        }
+        if len(self.__pending) >= self.max_batch:
+            self.bot.loop.create_task(self.flush())
+        elif self.__task is None:
+            self.__task = self.bot.loop.create_task(self.__flush_later())
+
+    async def __flush_later(self):
+        await asyncio.sleep(self.flush_seconds)
+        self.__task = None
+        await self.flush()
+
+    async def flush(self):
+        if len(self.__pending) == 0:
+            return
+        rows = list(self.__pending.values())
+        self.__pending = {}
+        if self.bot.db_session is None:
+            self.dropped += len(rows)
+            return
+        try:
+            await self.bot.loop.run_in_executor(None, self.__write, rows)
+            self.written += len(rows)
+        except Exception as exc:
+            print(exc)
+            self.dropped += len(rows)
+
+    def __write(self, rows: list):
+        session = self.bot.db_session
+        try:
+            users = insert(User).values([{"id": user_id} for user_id in {row["user_id"] for row in rows}])
+            session.execute(users.on_conflict_do_nothing(index_elements=[User.id]))
+            messages = insert(Message).values(rows)
+            session.execute(messages.on_conflict_do_update(index_elements=[Message.id], set_={
+                "content": messages.excluded.content,
+                "count_mentions": messages.excluded.count_mentions,
+                "count_attachments": messages.excluded.count_attachments,
+                "count_embeds": messages.excluded.count_embeds,
+                "event_type": messages.excluded.event_type,
+                "event_at": messages.excluded.event_at,
+                # a deletion after an edit keeps the content from before the edit
+                "before": func.coalesce(messages.excluded.before, Message.before)
+            }))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.remove()
+
+    async def fetch(self, message_ids: list) -> dict:
+        """
+        Returns records of logged messages, for events of messages that are no longer buffered.
+
+        Returns
+        -------
+        Dictionary of message ID to BufferedMessage
+        """
+        if self.bot.db_session is None or len(message_ids) == 0:
+            return {}
+        return await self.bot.loop.run_in_executor(None, self.__fetch, message_ids)
+
+    def __fetch(self, message_ids: list) -> dict:
+        session = self.bot.db_session
+        try:
+            rows = session.query(Message).filter(Message.id.in_(message_ids)).all()
+            return {row.id: BufferedMessage(row.id, row.user_id, row.content.encode(), row.count_attachments,
+                                            row.count_embeds, row.count_mentions) for row in rows}
+        finally:
+            session.remove()
@@ -0,0 +1,112 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import discord
+from discord.ext import commands
+
+
+MISS = object()
+
+
+class CheckCache:
+    """
+    LRU cache with TTL for global_check outcomes.
+
+    Keys are (guild, command, channel, member roles mask), outcomes are None if the check passed,
+    or the exception it raised. Invalidation bumps the guild's generation, so stale entries are
+    never returned and age out of the LRU on their own.
+    """
+    def __init__(self, max_size: int, ttl: float):
+        """
+        Parameters
+        ----------
+        max_size: int
+            Maximum number of outcomes kept.
+        ttl: float
+            Seconds an outcome stays valid.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.__entries = OrderedDict()
+        self.__generations = {}
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, guild_id: int, command_name: str, channel_id: int, roles_mask: int):
+        """
+        Returns cached outcome, or MISS if there is none.
+        """
+        key = (guild_id, self.__generations.get(guild_id, 0), command_name, channel_id, roles_mask)
+        entry = self.__entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self.__entries[key]
+        self.misses += 1
+        return MISS
+
+    def put(self, guild_id: int, command_name: str, channel_id: int, roles_mask: int,
+            outcome: Optional[commands.CheckFailure]):
+        key = (guild_id, self.__generations.get(guild_id, 0), command_name, channel_id, roles_mask)
+        self.__entries[key] = (time.monotonic() + self.ttl, outcome)
+        self.__entries.move_to_end(key)
+        if len(self.__entries) > self.max_size:
+            self.__entries.popitem(last=False)
+
+    def invalidate(self, guild_id: int):
+        """
+        Invalidates all outcomes of guild.
+        """
+        self.__generations[guild_id] = self.__generations.get(guild_id, 0) + 1
+        self.invalidations += 1
+
+    def clear(self):
+        self.__entries.clear()
+        self.invalidations += 1
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+
+def add_listeners(bot):
+    """
+    Registers event listeners invalidating cached check outcomes.
+    Member role changes need no listener, they change the roles mask that is part of the key.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    """
+    async def on_guild_role_create(role: discord.Role):
+        bot.check_cache.invalidate(role.guild.id)
+
+    async def on_guild_role_delete(role: discord.Role):
+        bot.check_cache.invalidate(role.guild.id)
+
+    async def on_guild_role_update(before: discord.Role, after: discord.Role):
+        bot.check_cache.invalidate(after.guild.id)
+
+    async def on_guild_channel_delete(channel: discord.abc.GuildChannel):
+        bot.check_cache.invalidate(channel.guild.id)
+
+    async def on_guild_channel_update(before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+        bot.check_cache.invalidate(after.guild.id)
+
+    async def on_guild_remove(guild: discord.Guild):
+        bot.check_cache.invalidate(guild.id)
+
+    bot.add_listener(on_guild_role_create)
+    bot.add_listener(on_guild_role_delete)
+    bot.add_listener(on_guild_role_update)
+    bot.add_listener(on_guild_channel_delete)
+    bot.add_listener(on_guild_channel_update)
+    bot.add_listener(on_guild_remove)
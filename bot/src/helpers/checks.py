@@ -1,113 +1,282 @@
+import time
+from dataclasses import dataclass
+from typing import Optional
+
 import discord
+from discord.ext import commands
 from discord.ext.commands import Context
-from helpers import general
+from helpers import permissions, roles, checkcache, cooldowns, schedules, moderators
+from helpers.permissions import CommandLimits
 import components.exceptions as ex
 
 
 async def global_check(ctx: Context, bot, ) -> bool:
-    if not bot.ready:
+    # guilds are ready once their shard's configs are loaded, DMs arrive on the first shard
+    if not bot.ready or ctx.guild is not None and ctx.guild.shard_id not in bot.ready_shards:
         raise ex.BotNotReady
 
-    if ctx.command.name not in bot.config["bot"]["limits"]["no_global_check"] and ctx.guild is not None:
-        guild_config = await general.deep_get_type(dict, bot.config, str(ctx.guild.id))
+    if ctx.guild is not None:
+        limits = permissions.get_command_limits(bot, ctx.guild.id, ctx.command)
+        if limits.skip_global_check:
+            return True
+
+        # Same command, channel and roles give the same outcome until the guild's config changes
+        roles_mask = roles.member_mask(bot, ctx.author)
+        outcome = bot.check_cache.get(ctx.guild.id, limits.name, ctx.channel.id, roles_mask)
+        if outcome is checkcache.MISS:
+            try:
+                check_limits(ctx, bot, limits)
+            except commands.CheckFailure as exc:
+                bot.check_cache.put(ctx.guild.id, limits.name, ctx.channel.id, roles_mask, exc)
+                raise
+            bot.check_cache.put(ctx.guild.id, limits.name, ctx.channel.id, roles_mask, None)
+        elif outcome is not None:
+            raise outcome.with_traceback(None)
 
-        # Is bot enabled on server? (set to True during setup)
-        await check_bot_enabled(ctx, bot, guild_config)
+    # cooldowns are consumed in check_cooldowns, which runs as before_invoke hook
+    return True
 
-        moderator_skip_enabled = await general.deep_get(bot.config, str(ctx.guild.id), "general", "mods_override_limits")
 
-        if await check_moderator_skip(ctx, bot, moderator_skip_enabled) is False:
-            await check_category_limits(ctx, guild_config)
-            await check_command_limits(ctx, guild_config)
+async def check_cooldowns(ctx: Context, bot):
+    """
+    Consumes a usage of every cooldown of the command, raises if any of them has none left.
+    Runs on invocation only, so that help and other can_run calls do not use up cooldowns.
+    """
+    if ctx.guild is None:
+        return
+    limits = permissions.get_command_limits(bot, ctx.guild.id, ctx.command)
+    if limits.skip_global_check or not limits.cooldowns or check_moderator_skip(ctx, bot, limits.mods_override):
+        return
+    now = time.monotonic()
+    keys = []
+    for cooldown in limits.cooldowns:
+        key = cooldown_key(ctx, cooldown)
+        retry_after = bot.cooldowns.retry_after(key, cooldown.rate, cooldown.per, now)
+        if retry_after > 0:
+            if cooldown.outer_scope == "categories":
+                raise ex.CategoryCooldown(retry_after)
+            raise ex.CommandCooldown(retry_after)
+        keys.append(key)
+    for key, cooldown in zip(keys, limits.cooldowns):
+        bot.cooldowns.consume(key, cooldown.rate, cooldown.per, now)
 
-        # TODO time limits
 
-    return True
+def record_invocation(ctx: Context, bot):
+    """
+    Records invocation for shadow evaluation of limits changes. Called for allowed and denied invocations.
+    """
+    if ctx.guild is not None and ctx.command is not None and isinstance(ctx.author, discord.Member):
+        bot.invocation_log.record(ctx.guild.id, ctx.command.name, ctx.channel.id, roles.member_mask(bot, ctx.author))
+
+
+def cooldown_key(ctx: Context, cooldown: permissions.Cooldown) -> tuple:
+    return (ctx.guild.id, cooldown.outer_scope, cooldown.name, cooldown.bucket_type,
+            cooldowns.bucket_subject(cooldown.bucket_type, ctx))
+
+
+def check_limits(ctx: Context, bot, limits: CommandLimits):
+    """
+    Runs all stages and raises exactly what running them in STAGES order would raise.
+
+    Stages may be evaluated in a different order (see StageStats). A stage at fixed
+    index i rejecting makes all stages after i irrelevant, so only stages before the
+    lowest rejecting one are evaluated further.
+    """
+    guild_stats = bot.stage_stats.get_guild(ctx.guild.id)
+    cutoff = len(STAGES)
+    failure = None
+    for index in bot.stage_stats.get_order(guild_stats):
+        if index >= cutoff:
+            continue
+        start = time.perf_counter_ns()
+        try:
+            skip_rest = STAGES[index](ctx, bot, limits)
+        except commands.CheckFailure as exc:
+            guild_stats.record(index, time.perf_counter_ns() - start, True)
+            cutoff = index
+            failure = exc
+            continue
+        guild_stats.record(index, time.perf_counter_ns() - start, skip_rest)
+        if skip_rest:
+            # moderator skip, nothing after this stage applies
+            cutoff = index
+            failure = None
+    bot.stage_stats.finish_check(guild_stats)
+    if failure is not None:
+        raise failure
 
 
-async def is_moderator(ctx: Context, bot):
-    mod_role = discord.utils.get(ctx.author.roles, id=bot.config[str(ctx.guild.id)]["essential_roles"]["mod_role"])
-    return True if mod_role in ctx.author.roles else False
+@dataclass(frozen=True)
+class CheckSubject:
+    """
+    Stands in for Context when stages run for someone other than the invoking user, eg in explain_limits.
+    Stages only use guild, channel, and author.
+    """
+    guild: discord.Guild
+    channel: discord.TextChannel
+    author: discord.Member
 
 
-async def check_moderator_skip(ctx, bot, skip_enabled: bool) -> bool:
-    return True if skip_enabled and await is_moderator(ctx, bot) else False
+@dataclass
+class StageTrace:
+    """
+    Outcome of one stage in explain_limits. result is "pass", "skip", or "reject".
+    """
+    name: str
+    path: str
+    result: str
+    exception: Optional[commands.CheckFailure]
+    microseconds: float
 
 
-async def check_bot_enabled(ctx: Context, bot, guild_config: dict):
-    bot_status = await general.deep_get(guild_config, "general", "enabled")
-    if bot_status is None:
-        if str(ctx.guild.id) in bot.corrupt_configs:
+def explain_limits(subject: CheckSubject, bot, limits: CommandLimits) -> list:
+    """
+    Runs every stage in fixed order and traces it, even after one rejected or skipped.
+    Does not record stage statistics and does not touch the check cache.
+
+    Parameters
+    ----------
+    subject: CheckSubject
+    bot
+        The bot object.
+    limits: CommandLimits
+        Compiled limits of the command.
+
+    Returns
+    -------
+    List of StageTrace in fixed order
+    """
+    traces = []
+    for stage, name, path in zip(STAGES, STAGE_NAMES, STAGE_PATHS):
+        exception = None
+        start = time.perf_counter_ns()
+        try:
+            result = "skip" if stage(subject, bot, limits) else "pass"
+        except commands.CheckFailure as exc:
+            result = "reject"
+            exception = exc
+        microseconds = (time.perf_counter_ns() - start) / 1000
+        traces.append(StageTrace(name, path.format(category=limits.category, command=limits.name),
+                                 result, exception, microseconds))
+    return traces
+
+
+def is_moderator(ctx: Context, bot):
+    return moderators.is_moderator(bot, ctx.author)
+
+
+def check_moderator_skip(ctx, bot, skip_enabled: bool) -> bool:
+    return True if skip_enabled and is_moderator(ctx, bot) else False
+
+
+# Stages return True if all later stages are to be skipped, raise if they reject
+
+
+def check_bot_enabled(ctx: Context, bot, limits: CommandLimits) -> bool:
+    if limits.bot_enabled is None:
+        if bot.config.is_unavailable(ctx.guild.id):
+            raise ex.DatabaseNotConnected
+        elif str(ctx.guild.id) in bot.corrupt_configs:
             raise ex.CorruptConfig
         else:
             raise ex.BotNotConfigured
-    elif bot_status is False and ctx.command.name not in bot.config["bot"]["limits"]["no_enable_check"]:
+    elif limits.bot_enabled is False and not limits.skip_enable_check:
         raise ex.BotDisabled
+    return False
 
 
-async def check_category_limits(ctx: Context, guild_config: dict):
-    guild_config_cat = await general.deep_get(guild_config, "limits", "categories")
-    if guild_config_cat is None:
-        return
-    # Is extension enabled on server?
-    if await general.deep_get(guild_config_cat, ctx.command.cog_name.lower(), "enabled") is False:
+def check_moderator_stage(ctx: Context, bot, limits: CommandLimits) -> bool:
+    return check_moderator_skip(ctx, bot, limits.mods_override)
+
+
+def check_category_enabled(ctx: Context, bot, limits: CommandLimits) -> bool:
+    if not limits.category_enabled:
         raise ex.CategoryDisabled
-    # Do not check for extension role limits if command has role limits specified
-    elif not await command_has_role_limits(ctx, guild_config):
-        # Does the extension have role limits?
-        wl = await general.deep_get_type(list, guild_config_cat, ctx.command.cog_name.lower(), "roles", "whitelist")
-        bl = await general.deep_get_type(list, guild_config_cat, ctx.command.cog_name.lower(), "roles", "blacklist")
-        result = await check_role_limits(ctx, wl, bl)
-        if result[0] == 1:
-            raise ex.CategoryNoWhitelistedRole(result[1])
-        elif result[0] == 2:
-            raise ex.CategoryBlacklistedRole(result[1])
-
-
-async def check_command_limits(ctx: Context, guild_config: dict):
-    guild_config_com = await general.deep_get(guild_config, "limits", "commands")
-    # Is command enabled on the server?
-    if await general.deep_get(guild_config_com, ctx.command.name, "enabled") is False:
+    return False
+
+
+def check_category_schedule(ctx: Context, bot, limits: CommandLimits) -> bool:
+    # Cached outcomes are invalidated by the window scheduler
+    if limits.category_schedule and not schedules.is_open(limits.category_schedule):
+        raise ex.CategoryUnavailable(limits.category_windows)
+    return False
+
+
+def check_category_roles(ctx: Context, bot, limits: CommandLimits) -> bool:
+    # Empty if command has role limits specified
+    result = check_role_limits(ctx, bot, limits.category_role_whitelist_mask, limits.category_role_blacklist_mask,
+                               limits.category_role_whitelist, limits.category_role_blacklist)
+    if result[0] == 1:
+        raise ex.CategoryNoWhitelistedRole(result[1])
+    elif result[0] == 2:
+        raise ex.CategoryBlacklistedRole(result[1])
+    return False
+
+
+def check_command_enabled(ctx: Context, bot, limits: CommandLimits) -> bool:
+    if not limits.command_enabled:
         raise ex.CommandDisabled
+    return False
+
+
+def check_command_schedule(ctx: Context, bot, limits: CommandLimits) -> bool:
+    if limits.command_schedule and not schedules.is_open(limits.command_schedule):
+        raise ex.CommandUnavailable(limits.command_windows)
+    return False
 
-    # Does the command have channel limits?
-    wl = await general.deep_get_type(list, guild_config_com, ctx.command.name, "channels", "whitelist")
-    bl = await general.deep_get_type(list, guild_config_com, ctx.command.name, "channels", "blacklist")
-    if len(wl) > 0 and ctx.channel.id not in wl:
+
+def check_command_channels(ctx: Context, bot, limits: CommandLimits) -> bool:
+    if limits.channel_whitelist and ctx.channel.id not in limits.channel_whitelist:
         raise ex.CommandNotWhitelistedChannel
-    if ctx.channel.id in bl:
+    if ctx.channel.id in limits.channel_blacklist:
         raise ex.CommandBlacklistedChannel
+    return False
+
 
-    # Does the command have role limits?
-    wl = await general.deep_get_type(list, guild_config_com, ctx.command.name, "roles", "whitelist")
-    bl = await general.deep_get_type(list, guild_config_com, ctx.command.name, "roles", "blacklist")
-    result = await check_role_limits(ctx, wl, bl)
+def check_command_roles(ctx: Context, bot, limits: CommandLimits) -> bool:
+    result = check_role_limits(ctx, bot, limits.role_whitelist_mask, limits.role_blacklist_mask,
+                               limits.role_whitelist, limits.role_blacklist)
     if result[0] == 1:
         raise ex.CommandNoWhitelistedRole(result[1])
     if result[0] == 2:
         raise ex.CommandBlacklistedRole(result[1])
+    return False
 
 
-async def command_has_role_limits(ctx: Context, guild_config: dict) -> int:
-    if guild_config is not None:
-        wl = await general.deep_get_type(list, guild_config, ctx.command.name, "limits", "commands", "roles", "whitelist")
-        bl = await general.deep_get_type(list, guild_config, ctx.command.name, "limits", "commands", "roles", "blacklist")
-        return len(wl) + len(bl) > 0
-    return False
+# Fixed order, this order defines which exception is raised if several stages reject
+STAGES = (
+    check_bot_enabled,
+    check_moderator_stage,
+    check_category_enabled,
+    check_category_schedule,
+    check_category_roles,
+    check_command_enabled,
+    check_command_schedule,
+    check_command_channels,
+    check_command_roles
+)
+STAGE_NAMES = tuple(stage.__name__[len("check_"):] for stage in STAGES)
+# Config the stages read, formatted with category and command name
+STAGE_PATHS = (
+    "general.enabled",
+    "general.mods_override_limits, essential_roles.mod_role",
+    "limits.categories.{category}.enabled",
+    "limits.categories.{category}.schedule",
+    "limits.categories.{category}.roles",
+    "limits.commands.{command}.enabled",
+    "limits.commands.{command}.schedule",
+    "limits.commands.{command}.channels",
+    "limits.commands.{command}.roles"
+)
 
 
-async def check_role_limits(ctx, wl, bl):
-    if len(wl) + len(bl) > 0:
-        match = False
-        for role in ctx.author.roles:
-            # TODO check if this can throw exception if bl/wl is None
-            if role.id in wl:
-                match = True
-            if role.id in bl:
-                return [2, role]
-        if len(wl) > 0 and match is False:
-            role_list = []
-            for role_id in wl:
-                role_list.append(ctx.guild.get_role(role_id))
-            return [1, role_list]
+def check_role_limits(ctx, bot, wl_mask: int, bl_mask: int, wl: frozenset, bl: frozenset):
+    if wl_mask or bl_mask:
+        mask = roles.member_mask(bot, ctx.author)
+        if mask & bl_mask:
+            # first blacklisted role in the author's role order
+            return [2, roles.roles_in_mask(ctx.author, bl)[0]]
+        if wl_mask and not mask & wl_mask:
+            role_list = [role for role in map(ctx.guild.get_role, wl) if role is not None]
+            return [1, sorted(role_list, reverse=True)]
     return [0]
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Optional
+
+from helpers.ratelimits import RateLimiter
+
+RESTART_DELAY_MIN = 1
+RESTART_DELAY_MAX = 60
+# workers running at least this long are considered healthy, their restart delay is reset
+HEALTHY_SECONDS = 60
+
+
+def shard_ranges(shard_count: int, cluster_count: int) -> list:
+    """
+    Splits shards into contiguous ranges of nearly equal size, one per cluster.
+
+    Returns
+    -------
+    List of lists of shard IDs, indexed by cluster ID
+    """
+    size, remainder = divmod(shard_count, cluster_count)
+    ranges = []
+    start = 0
+    for cluster_id in range(cluster_count):
+        end = start + size + (1 if cluster_id < remainder else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+def shard_of(guild_id: int, shard_count: int) -> int:
+    return (guild_id >> 22) % shard_count
+
+
+def encode(message: dict) -> bytes:
+    return json.dumps(message).encode() + b"\n"
+
+
+class Coordinator:
+    """
+    Local coordinator of a cluster, runs in its own process (see coordinator.py).
+
+    Starts one worker process per shard range and restarts workers that exit, waiting longer
+    after every crash in a row. Workers connect to its unix socket and exchange JSON lines;
+    messages about a guild are forwarded to the worker owning the guild's shard.
+    Messages for a worker that is down are dropped, it loads all configs from disk when it restarts.
+
+    It also keeps the REST rate limits of all processes, they share one token. Without workers it only
+    does that, for bot processes started some other way.
+    """
+    def __init__(self, shard_count: int, cluster_count: int, socket_path: str):
+        self.shard_count = shard_count
+        self.ranges = shard_ranges(shard_count, cluster_count) if cluster_count > 0 else []
+        self.socket_path = socket_path
+        self.writers = {}
+        self.rate_limiter = RateLimiter()
+
+    async def run(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = await asyncio.start_unix_server(self.__handle_connection, path=self.socket_path)
+        print("Coordinator listening on " + self.socket_path)
+        async with server:
+            if len(self.ranges) > 0:
+                await asyncio.gather(*[self.__supervise(cluster_id) for cluster_id in range(len(self.ranges))])
+            else:
+                await server.serve_forever()
+
+    def owner_of(self, guild_id: int) -> int:
+        shard_id = shard_of(guild_id, self.shard_count)
+        return next(cluster_id for cluster_id, shard_ids in enumerate(self.ranges) if shard_id in shard_ids)
+
+    async def __supervise(self, cluster_id: int):
+        shard_ids = self.ranges[cluster_id]
+        env = dict(os.environ, SHARD_COUNT=str(self.shard_count), SHARD_IDS=",".join(map(str, shard_ids)),
+                   CLUSTER_ID=str(cluster_id), CLUSTER_SOCKET=self.socket_path)
+        delay = RESTART_DELAY_MIN
+        while True:
+            print("Starting worker " + str(cluster_id) + " with shards " + str(shard_ids[0]) + "-" + str(shard_ids[-1]))
+            started = time.monotonic()
+            process = await asyncio.create_subprocess_exec(sys.executable, "amadeus.py", env=env)
+            return_code = await process.wait()
+            if time.monotonic() - started >= HEALTHY_SECONDS:
+                delay = RESTART_DELAY_MIN
+            print("Worker " + str(cluster_id) + " exited with code " + str(return_code) + ", restarting in "
+                  + str(delay) + "s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RESTART_DELAY_MAX)
+
+    async def __handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        cluster_id = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if message["op"] == "hello":
+                    cluster_id = message["cluster_id"]
+                    self.writers[cluster_id] = writer
+                elif message["op"] == "acquire":
+                    delay = self.rate_limiter.acquire(message["bucket"])
+                    writer.write(encode({"id": message["id"], "delay": delay}))
+                    await writer.drain()
+                elif message["op"] == "report":
+                    self.rate_limiter.report(message["bucket"], message.get("limit"), message["remaining"],
+                                             message["reset_after"], message["global_retry_after"])
+                elif "guild_id" in message:
+                    await self.__forward(message)
+        finally:
+            if cluster_id is not None and self.writers.get(cluster_id) is writer:
+                del self.writers[cluster_id]
+            writer.close()
+
+    async def __forward(self, message: dict):
+        writer = self.writers.get(self.owner_of(message["guild_id"]))
+        if writer is not None:
+            writer.write(encode(message))
+            await writer.drain()
+
+
+class ClusterClient:
+    """
+    Connection of a worker to the coordinator, reconnects if the connection is lost.
+    """
+    def __init__(self, bot, socket_path: str, cluster_id: Optional[int]):
+        self.bot = bot
+        self.socket_path = socket_path
+        self.cluster_id = cluster_id
+        self.__writer = None
+        self.__task = None
+        self.__next_id = 0
+        self.__pending = {}
+
+    def start(self):
+        if self.__task is None:
+            self.__task = self.bot.loop.create_task(self.__run())
+
+    def owns(self, guild_id: int) -> bool:
+        if self.cluster_id is None:
+            return True
+        return shard_of(guild_id, self.bot.shard_count) in self.bot.shard_ids
+
+    async def send(self, message: dict):
+        if self.__writer is not None:
+            self.__writer.write(encode(message))
+            await self.__writer.drain()
+
+    async def request(self, message: dict, timeout: float) -> Optional[dict]:
+        """
+        Sends message and waits for the coordinator's response.
+
+        Returns
+        -------
+        Response, None if not connected or the coordinator did not respond in time
+        """
+        if self.__writer is None:
+            return None
+        self.__next_id += 1
+        message_id = message["id"] = self.__next_id
+        future = self.__pending[message_id] = self.bot.loop.create_future()
+        try:
+            await self.send(message)
+            return await asyncio.wait_for(future, timeout)
+        except (OSError, asyncio.TimeoutError):
+            return None
+        finally:
+            self.__pending.pop(message_id, None)
+
+    async def __run(self):
+        while True:
+            try:
+                reader, self.__writer = await asyncio.open_unix_connection(self.socket_path)
+                if self.cluster_id is not None:
+                    await self.send({"op": "hello", "cluster_id": self.cluster_id})
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    # a bad message is dropped, the connection stays up for the others
+                    try:
+                        self.__handle(json.loads(line))
+                    except Exception as exc:
+                        print(exc)
+            except (OSError, ValueError) as exc:
+                # ValueError for lines longer than the reader's limit
+                print(exc)
+            finally:
+                # requests must not wait for responses of a connection that is gone
+                self.__writer = None
+            await asyncio.sleep(RESTART_DELAY_MIN)
+
+    def __handle(self, message: dict):
+        if "id" in message:
+            future = self.__pending.get(message["id"])
+            if future is not None and not future.done():
+                future.set_result(message)
+        elif message["op"] == "config_changed":
+            # loading takes a while, responses to requests are read meanwhile
+            self.bot.loop.create_task(self.__reload(message["guild_id"]))
+
+    async def __reload(self, guild_id: int):
+        try:
+            await reload_config(self.bot, guild_id)
+        except Exception as exc:
+            print(exc)
+
+
+async def reload_config(bot, guild_id: int):
+    """
+    Reloads config of guild from the config store and its journal and recompiles its limits.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    guild_id: int
+        ID of the guild.
+    """
+    await bot.config.reload(guild_id)
+
+
+async def publish_config(bot, guild_id: int):
+    """
+    Tells the worker owning guild that its config changed, must be called after the config is saved.
+    Does nothing if the bot is not part of a cluster or owns the guild itself.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    guild_id: int
+        ID of the guild.
+    """
+    cluster: Optional[ClusterClient] = bot.cluster
+    if cluster is not None and not cluster.owns(guild_id):
+        await cluster.send({"op": "config_changed", "guild_id": guild_id})
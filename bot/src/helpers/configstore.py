@@ -0,0 +1,220 @@
+import datetime
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from sqlalchemy import Text, cast, literal, select
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from database.models import GuildConfig
+
+CONFIG_DIRECTORY = "config/"
+BACKUP_DIRECTORY = "config/backup/"
+# errors stores raise when reading or writing fails, callers catch these
+STORE_ERRORS = (OSError, SQLAlchemyError, sqlite3.Error)
+
+
+class ConfigStore(ABC):
+    """
+    Where guild config snapshots are kept. Contents are json as bytes, see configwriter.serialize.
+    All methods block, callers run them in the default executor.
+    """
+    name = None
+
+    @abstractmethod
+    def read(self, guild_id: int) -> Optional[bytes]:
+        """
+        Returns snapshot of guild, None if it has none.
+        """
+
+    @abstractmethod
+    def write_many(self, contents: dict):
+        """
+        Writes snapshots of several guilds, contents maps guild IDs to json.
+        """
+
+    def write(self, guild_id: int, content: bytes):
+        self.write_many({guild_id: content})
+
+    @abstractmethod
+    def guild_ids(self) -> set:
+        """
+        Returns IDs of all guilds with a snapshot.
+        """
+
+    def write_backup(self, guild_id: int, content: bytes):
+        """
+        Keeps a copy of a guild's config next to its snapshot, eg before a setup changes it.
+        """
+        with open(BACKUP_DIRECTORY + str(guild_id) + ".json", 'wb') as backup_file:
+            backup_file.write(content)
+
+    def import_from(self, store) -> int:
+        """
+        Copies all snapshots of store if this store is empty, eg on the first start with a new backend.
+
+        Returns
+        -------
+        Number of imported snapshots
+        """
+        if len(self.guild_ids()) > 0:
+            return 0
+        guild_ids = store.guild_ids()
+        if len(guild_ids) > 0:
+            self.write_many({guild_id: store.read(guild_id) for guild_id in guild_ids})
+        return len(guild_ids)
+
+    def close(self):
+        pass
+
+
+class FileStore(ConfigStore):
+    """
+    One json file per guild in the config directory. Every file is replaced atomically,
+    but a write of several guilds is not, each guild costs its own file and fsync.
+    """
+    name = "file"
+
+    def __init__(self, directory: str = CONFIG_DIRECTORY):
+        self.directory = directory
+
+    def read(self, guild_id: int) -> Optional[bytes]:
+        try:
+            with open(self.__get_path(guild_id), 'rb') as json_file:
+                return json_file.read()
+        except FileNotFoundError:
+            return None
+
+    def write_many(self, contents: dict):
+        for guild_id, content in contents.items():
+            # a crash while writing leaves the previous file
+            path = self.__get_path(guild_id)
+            temp_path = path + ".tmp"
+            with open(temp_path, 'wb') as file:
+                file.write(content)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, path)
+
+    def guild_ids(self) -> set:
+        return {int(entry.name[:-5]) for entry in os.scandir(self.directory)
+                if entry.name.endswith(".json") and entry.name[:-5].isdigit()}
+
+    def __get_path(self, guild_id: int) -> str:
+        return self.directory + str(guild_id) + ".json"
+
+
+class SQLiteStore(ConfigStore):
+    """
+    All snapshots and backups in one SQLite file. A write of several guilds is one transaction
+    with one fsync of the write-ahead log, no matter how many guilds it contains.
+    The connection is shared by the executor's threads and used by one of them at a time.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute("PRAGMA synchronous=FULL")
+        for table in ("guild_config", "guild_config_backup"):
+            self.__connection.execute("CREATE TABLE IF NOT EXISTS " + table + " (guild_id INTEGER PRIMARY KEY, "
+                                      "config BLOB NOT NULL, updated_at REAL NOT NULL)")
+
+    def read(self, guild_id: int) -> Optional[bytes]:
+        with self.__lock:
+            row = self.__connection.execute("SELECT config FROM guild_config WHERE guild_id = ?",
+                                            (guild_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def write_many(self, contents: dict):
+        self.__write("guild_config", contents)
+
+    def guild_ids(self) -> set:
+        with self.__lock:
+            return {guild_id for guild_id, in self.__connection.execute("SELECT guild_id FROM guild_config")}
+
+    def write_backup(self, guild_id: int, content: bytes):
+        self.__write("guild_config_backup", {guild_id: content})
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
+
+    def __write(self, table: str, contents: dict):
+        now = time.time()
+        with self.__lock:
+            self.__connection.execute("BEGIN")
+            try:
+                self.__connection.executemany("INSERT OR REPLACE INTO " + table + " VALUES (?, ?, ?)",
+                                              [(guild_id, content, now) for guild_id, content in contents.items()])
+                self.__connection.execute("COMMIT")
+            except sqlite3.Error:
+                self.__connection.execute("ROLLBACK")
+                raise
+
+
+class PostgresStore(ConfigStore):
+    """
+    One JSONB row per guild in the guild_config table of the bot's database.
+    A write of several guilds is one statement. Backups stay files.
+    """
+    name = "postgresql"
+
+    def __init__(self, session):
+        self.session = session
+
+    def read(self, guild_id: int) -> Optional[bytes]:
+        try:
+            content = self.session.execute(select([cast(GuildConfig.config, Text)])
+                                           .where(GuildConfig.guild_id == guild_id)).scalar()
+            return content.encode() if content is not None else None
+        finally:
+            self.session.remove()
+
+    def write_many(self, contents: dict):
+        now = datetime.datetime.utcnow()
+        # the json text is cast by the database, it is not parsed and serialized again here
+        statement = insert(GuildConfig).values([
+            {"guild_id": guild_id, "config": cast(literal(content.decode(), Text), JSONB), "updated_at": now}
+            for guild_id, content in contents.items()])
+        try:
+            self.session.execute(statement.on_conflict_do_update(index_elements=[GuildConfig.guild_id], set_={
+                "config": statement.excluded.config,
+                "updated_at": statement.excluded.updated_at
+            }))
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        finally:
+            self.session.remove()
+
+    def guild_ids(self) -> set:
+        try:
+            return {guild_id for guild_id, in self.session.query(GuildConfig.guild_id)}
+        finally:
+            self.session.remove()
+
+
+def create_store(backend: str, session, sqlite_path: str) -> ConfigStore:
+    """
+    Parameters
+    ----------
+    backend: str
+        "postgresql", "sqlite" or "file".
+    session
+        Database session, PostgreSQL falls back to files if it is None.
+    sqlite_path: str
+        Path of the SQLite file.
+    """
+    if backend == "postgresql" and session is not None:
+        return PostgresStore(session)
+    if backend == "sqlite":
+        return SQLiteStore(sqlite_path)
+    return FileStore()
@@ -0,0 +1,61 @@
+from typing import Any, Optional
+
+from helpers import general
+
+
+def compile_defaults(options: dict) -> dict:
+    """
+    Precomputes the default of every option in values/options.json.
+
+    Parameters
+    -----------
+    options: dict
+        Content of values/options.json.
+
+    Returns
+    -------
+    Dictionary of (category, name) to default value, options without default are left out
+    """
+    defaults = {}
+    for category, category_values in options.items():
+        for name, option in category_values.get("list", {}).items():
+            if "default" in option:
+                defaults[(category, name)] = option["default"]
+    return defaults
+
+
+class ConfigView:
+    """
+    Read-only view of a guild's config: the guild's overrides layered over the option defaults.
+    Reading through it never changes the guild's config, which only holds values that were set.
+    """
+    __slots__ = ("overrides", "defaults")
+
+    def __init__(self, overrides: Optional[dict], defaults: dict):
+        self.overrides = overrides
+        self.defaults = defaults
+
+    def get_override(self, category: str, name: str) -> Any:
+        return general.deep_get_sync(self.overrides, category, name)
+
+    def get_default(self, category: str, name: str) -> Any:
+        return self.defaults.get((category, name))
+
+    def get(self, category: str, name: str) -> Any:
+        value = self.get_override(category, name)
+        return value if value is not None else self.get_default(category, name)
+
+    def get_category(self, category: str) -> dict:
+        """
+        Returns all options of category, eg the errors block on every failed command.
+        """
+        values = {name: value for (option_category, name), value in self.defaults.items()
+                  if option_category == category}
+        overrides = general.deep_get_sync(self.overrides, category)
+        if overrides:
+            values.update((name, value) for name, value in overrides.items() if value is not None)
+        return values
+
+
+def get_config_view(bot, guild_id: int) -> ConfigView:
+    return ConfigView(bot.config.get(str(guild_id)), bot.option_defaults)
@@ -0,0 +1,136 @@
+import asyncio
+import copy
+import hashlib
+import json
+
+from helpers.configstore import STORE_ERRORS
+
+MAX_RETRIES = 4
+
+
+def serialize(guild_config: dict) -> bytes:
+    """
+    Canonical file content of a guild config, identical configs give identical bytes.
+    """
+    return json.dumps(guild_config, indent=4).encode()
+
+
+class ConfigWriter:
+    """
+    Write-behind persistence of guild config snapshots.
+
+    Snapshots are written when the Journal compacts a guild's journal. save() only marks the guild,
+    all guilds marked within delay_seconds are written together once the delay ends, in one transaction
+    if the config store supports it. Snapshots are taken when the write starts, along with the number of
+    journal entries they contain, which is what save() resolves to. Guilds with staged changes are skipped. Serializing and writing run in the
+    default executor, and snapshots whose content equals the last written or loaded one are skipped.
+    Failed writes are retried a few times. flush() writes all marked guilds now.
+    """
+    def __init__(self, bot, delay_seconds: float):
+        self.bot = bot
+        self.delay_seconds = delay_seconds
+        self.written = 0
+        self.skipped = 0
+        self.failed = 0
+        # guild ID to future of the write it is marked for
+        self.__pending = {}
+        self.__timer = None
+        self.__lock = asyncio.Lock()
+        self.__digests = {}
+
+    @property
+    def pending(self) -> int:
+        return len(self.__pending)
+
+    def remember(self, guild_id: int, content: bytes):
+        """
+        Records content of a guild's snapshot as loaded, so saving it unchanged writes nothing.
+        """
+        self.__digests[guild_id] = hashlib.blake2b(content).digest()
+
+    def is_pending(self, guild_id: int) -> bool:
+        return guild_id in self.__pending
+
+    def save(self, guild_id: int) -> asyncio.Future:
+        """
+        Marks guild for the next write.
+
+        Returns
+        -------
+        Future of the number of journal entries the written snapshot contains, None if it was not written
+        """
+        future = self.__pending.get(guild_id)
+        if future is None:
+            future = self.__pending[guild_id] = self.bot.loop.create_future()
+        if self.__timer is None:
+            self.__timer = self.bot.loop.create_task(self.__write_later())
+        return future
+
+    async def flush(self):
+        """
+        Writes all marked guilds now, eg on shutdown.
+        """
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+        await self.__write_pending()
+
+    async def __write_later(self):
+        await asyncio.sleep(self.delay_seconds)
+        self.__timer = None
+        await self.__write_pending()
+
+    async def __write_pending(self):
+        pending = self.__pending
+        self.__pending = {}
+        if len(pending) == 0:
+            return
+        entries = await self.__write(list(pending))
+        for guild_id, future in pending.items():
+            if not future.done():
+                future.set_result(entries.get(guild_id))
+
+    async def __write(self, guild_ids: list, retries: int = MAX_RETRIES) -> dict:
+        # snapshots on the loop, configs may change while the executor serializes them
+        snapshots = {}
+        entries = {}
+        for guild_id in guild_ids:
+            guild_config = self.bot.config.get(str(guild_id))
+            # staged changes are in the config but not the journal and may still be discarded,
+            # the guild is written once its journal is due for compaction again
+            if guild_config is not None and not self.bot.journal.is_staged(guild_id):
+                snapshots[guild_id] = copy.deepcopy(guild_config)
+                entries[guild_id] = self.bot.journal.entries(guild_id)
+        if len(snapshots) == 0:
+            return {}
+        last_digests = {guild_id: self.__digests.get(guild_id) for guild_id in snapshots}
+        try:
+            async with self.__lock:
+                digests = await self.bot.loop.run_in_executor(None, self.__write_snapshots, self.bot.config.store,
+                                                              snapshots, last_digests)
+        except STORE_ERRORS as exc:
+            print(exc)
+            self.failed += 1
+            if retries > 0:
+                await asyncio.sleep(1)
+                return await self.__write(guild_ids, retries - 1)
+            return {}
+        self.__digests.update(digests)
+        self.written += len(digests)
+        self.skipped += len(snapshots) - len(digests)
+        return entries
+
+    @staticmethod
+    def __write_snapshots(store, snapshots: dict, last_digests: dict) -> dict:
+        contents = {}
+        digests = {}
+        for guild_id, snapshot in snapshots.items():
+            content = serialize(snapshot)
+            digest = hashlib.blake2b(content).digest()
+            if digest != last_digests[guild_id]:
+                contents[guild_id] = content
+                digests[guild_id] = digest
+        # changed guilds are written together, in one transaction if the store supports it
+        if len(contents) > 0:
+            store.write_many(contents)
+        return digests
@@ -0,0 +1,79 @@
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Hashable
+
+
+class BucketType(Enum):
+    USER = "user"
+    CHANNEL = "channel"
+    GUILD = "guild"
+
+
+class TokenBucketStore:
+    """
+    Memory-bounded store of token buckets for cooldowns.
+
+    A bucket holds up to rate tokens and regains one every per / rate seconds. Buckets are
+    refilled lazily when accessed, so there is no background task. A full bucket behaves
+    exactly like a missing one, which lets full buckets be dropped whenever they are seen.
+    The store never holds more than max_buckets buckets, least recently used ones are evicted first.
+    """
+    def __init__(self, max_buckets: int):
+        """
+        Parameters
+        ----------
+        max_buckets: int
+            Maximum number of buckets kept in memory.
+        """
+        self.max_buckets = max_buckets
+        self.__buckets = OrderedDict()
+
+    def __len__(self):
+        return len(self.__buckets)
+
+    def retry_after(self, key: Hashable, rate: int, per: float, now: float = None) -> float:
+        """
+        Returns seconds until a token is available in bucket, 0 if one is available now.
+        Does not consume a token.
+        """
+        tokens = self.__tokens(key, rate, per, time.monotonic() if now is None else now)
+        return 0.0 if tokens >= 1 else (1 - tokens) * per / rate
+
+    def consume(self, key: Hashable, rate: int, per: float, now: float = None):
+        """
+        Takes one token from bucket. Call retry_after first, this does not check availability.
+        """
+        now = time.monotonic() if now is None else now
+        tokens = self.__tokens(key, rate, per, now) - 1
+        self.__buckets[key] = (max(tokens, 0.0), now)
+        self.__buckets.move_to_end(key)
+        while len(self.__buckets) > self.max_buckets:
+            self.__buckets.popitem(last=False)
+
+    def __tokens(self, key: Hashable, rate: int, per: float, now: float) -> float:
+        bucket = self.__buckets.get(key)
+        if bucket is None:
+            return rate
+        tokens = bucket[0] + (now - bucket[1]) * rate / per
+        if tokens >= rate:
+            # full again, same as never having been used
+            del self.__buckets[key]
+            return rate
+        return tokens
+
+
+def bucket_subject(bucket_type: BucketType, ctx) -> int:
+    """
+    Returns ID of whatever the bucket type limits (user, channel, or guild).
+
+    Parameters
+    ----------
+    bucket_type: BucketType
+    ctx: discord.ext.commands.Context
+    """
+    if bucket_type == BucketType.USER:
+        return ctx.author.id
+    elif bucket_type == BucketType.CHANNEL:
+        return ctx.channel.id
+    return ctx.guild.id
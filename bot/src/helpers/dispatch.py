@@ -0,0 +1,96 @@
+import functools
+from typing import Optional
+
+import discord
+from discord.ext import commands
+
+from helpers import general
+
+GUILD_CATEGORIES = general.compile_path("limits", "categories")
+
+
+def compile_guild(bot, guild_id: int) -> frozenset:
+    """
+    (Re)compiles the set of categories the guild disabled from its config.
+    Called by permissions.compile_guild, so it follows every config change.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    guild_id: int
+        ID of the guild.
+
+    Returns
+    -------
+    Frozenset of lowercase category names
+    """
+    categories = GUILD_CATEGORIES(bot.config.get(str(guild_id)))
+    disabled = bot.disabled_categories[guild_id] = frozenset(
+        category for category, limits in (categories or {}).items()
+        if isinstance(limits, dict) and limits.get("enabled") is False)
+    return disabled
+
+
+def get_guild_id(event_argument) -> Optional[int]:
+    """
+    Returns ID of the guild an event happened in, None if it did not happen in a guild.
+    Covers models with guild (messages, members, channels, roles), raw events with guild_id,
+    reactions through their message, and guilds themselves.
+    """
+    if isinstance(event_argument, discord.Guild):
+        return event_argument.id
+    guild = getattr(event_argument, "guild", None)
+    if guild is not None:
+        return guild.id
+    guild_id = getattr(event_argument, "guild_id", None)
+    if guild_id is not None:
+        return guild_id
+    message = getattr(event_argument, "message", None)
+    if message is not None and message.guild is not None:
+        return message.guild.id
+    return None
+
+
+def listener(name: str = None):
+    """
+    Decorator for cog listeners, to be used instead of commands.Cog.listener.
+
+    The listener is skipped for guilds that disabled the cog's category through
+    limits.categories.<cog>.enabled. Only the first event argument is inspected for the guild,
+    events outside of guilds always run. The cog needs a bot attribute.
+
+    Parameters
+    ----------
+    name: str
+        Name of the event, defaults to the function's name like commands.Cog.listener.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def guarded(cog: commands.Cog, *args, **kwargs):
+            if len(args) > 0:
+                guild_id = get_guild_id(args[0])
+                if guild_id is not None:
+                    # categories are compiled once the guild's config is loaded
+                    if guild_id not in cog.bot.disabled_categories:
+                        await cog.bot.config.ensure(guild_id)
+                    if cog.qualified_name.lower() in cog.bot.disabled_categories.get(guild_id, frozenset()):
+                        return
+            await func(cog, *args, **kwargs)
+        return commands.Cog.listener(name)(guarded)
+    return decorator
+
+
+def add_listeners(bot):
+    """
+    Registers event listeners dropping disabled categories of guilds the bot left.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    """
+    async def on_guild_remove(guild: discord.Guild):
+        bot.disabled_categories.pop(guild.id, None)
+
+    bot.add_listener(on_guild_remove)
@@ -1,10 +1,9 @@
-from functools import reduce
-from typing import Any
+from typing import Any, Callable
 
 
-async def deep_get(dictionary: dict, *keys) -> Any:
+def deep_get_sync(dictionary: dict, *keys) -> Any:
     """
-    Gets value for nested dictionaries
+    Gets value for nested dictionaries without going through a coroutine.
 
     Parameters
     ----------
@@ -15,12 +14,16 @@ async def deep_get(dictionary: dict, *keys) -> Any:
     -------
     Value if found, None if not
     """
-    return reduce(lambda d, key: d.get(key) if d else None, keys, dictionary)
+    for key in keys:
+        if not dictionary:
+            return None
+        dictionary = dictionary.get(key)
+    return dictionary
 
 
-async def deep_get_type(data_type: type, dictionary: dict, *keys) -> Any:
+def deep_get_type_sync(data_type: type, dictionary: dict, *keys) -> Any:
     """
-    Gets value for nested dictionaries with a fallback type
+    Gets value for nested dictionaries with a fallback type without going through a coroutine.
 
     Parameters
     ----------
@@ -32,7 +35,7 @@ async def deep_get_type(data_type: type, dictionary: dict, *keys) -> Any:
     -------
     Value if found, default for given type if not
     """
-    result = await deep_get(dictionary, *keys)
+    result = deep_get_sync(dictionary, *keys)
     if result is None:
         if data_type == dict:
             return {}
@@ -41,3 +44,79 @@ async def deep_get_type(data_type: type, dictionary: dict, *keys) -> Any:
         elif data_type == str:
             return ""
     return result
+
+
+def compile_path(*keys) -> Callable[[dict], Any]:
+    """
+    Precompiles key path for nested dictionaries.
+    Meant for paths that are read on every command, eg compile_path("general", "language").
+
+    Parameters
+    ----------
+    keys: List[str]
+
+    Returns
+    -------
+    Function taking a dictionary and returning the value if found, None if not
+    """
+    if len(keys) == 1:
+        key_a, = keys
+
+        def get(dictionary: dict) -> Any:
+            return dictionary.get(key_a) if dictionary else None
+    elif len(keys) == 2:
+        key_a, key_b = keys
+
+        def get(dictionary: dict) -> Any:
+            if not dictionary:
+                return None
+            dictionary = dictionary.get(key_a)
+            return dictionary.get(key_b) if dictionary else None
+    elif len(keys) == 3:
+        key_a, key_b, key_c = keys
+
+        def get(dictionary: dict) -> Any:
+            if not dictionary:
+                return None
+            dictionary = dictionary.get(key_a)
+            if not dictionary:
+                return None
+            dictionary = dictionary.get(key_b)
+            return dictionary.get(key_c) if dictionary else None
+    else:
+        def get(dictionary: dict) -> Any:
+            return deep_get_sync(dictionary, *keys)
+    return get
+
+
+async def deep_get(dictionary: dict, *keys) -> Any:
+    """
+    Gets value for nested dictionaries
+
+    Parameters
+    ----------
+    dictionary: dict
+    keys: List[str]
+
+    Returns
+    -------
+    Value if found, None if not
+    """
+    return deep_get_sync(dictionary, *keys)
+
+
+async def deep_get_type(data_type: type, dictionary: dict, *keys) -> Any:
+    """
+    Gets value for nested dictionaries with a fallback type
+
+    Parameters
+    ----------
+    data_type: type
+    dictionary: dict
+    keys: List[str]
+
+    Returns
+    -------
+    Value if found, default for given type if not
+    """
+    return deep_get_type_sync(data_type, dictionary, *keys)
@@ -0,0 +1,302 @@
+import asyncio
+import sys
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Optional
+
+import discord
+
+from helpers import permissions
+from helpers.configstore import STORE_ERRORS, ConfigStore, FileStore
+
+
+def estimate_size(value) -> int:
+    """
+    Estimates memory used by a json-like value in bytes, containers including their contents.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += sys.getsizeof(key) + estimate_size(item)
+    elif isinstance(value, list):
+        for item in value:
+            size += estimate_size(item)
+    return size
+
+
+class GuildConfigs(MutableMapping):
+    """
+    bot.config: the bot's own config under "bot", guild configs under their guild ID as string.
+
+    Guild configs are loaded from the config store and journal on first access and kept in order of
+    their last access. Once all loaded configs together exceed max_bytes, the configs that have been
+    idle the longest are evicted, except those with unsaved changes. Evicted guilds keep their
+    prefixes and moderator roles compiled, their limits are compiled again when they are next used.
+
+    ensure() loads in the default executor and must be awaited before a guild's config is needed,
+    eg for every accepted message. Plain access only returns loaded configs, to everything else a
+    guild that is not loaded looks like a guild without config. Guilds are held while one of their
+    commands runs, so that a command waiting on its user does not lose the config it was started with.
+
+    A guild whose load failed on a store error, eg while the database is down, keeps its config and is
+    only unavailable, the next ensure() tries again. Guilds whose config is corrupt are not configured.
+    """
+    def __init__(self, bot, max_bytes: int):
+        self.bot = bot
+        self.max_bytes = max_bytes
+        self.store = FileStore()
+        # files in place of the configured store, which still has to see every change once it is back
+        self.fallback = False
+        self.bytes = 0
+        self.loads = 0
+        self.evictions = 0
+        self.__bot_config = None
+        # least recently used first
+        self.__configs = OrderedDict()
+        self.__sizes = {}
+        # every guild with a stored config, loaded or not
+        self.__guild_ids = set()
+        self.__loading = {}
+        # guilds whose last load failed on a store error
+        self.__unavailable = set()
+        # guild ID to number of running commands
+        self.__held = {}
+
+    @property
+    def loaded(self) -> int:
+        return len(self.__configs)
+
+    async def attach(self, store: ConfigStore, fallback: bool = False):
+        """
+        Switches to store and lists the guilds that have a config. Nothing is loaded.
+
+        Parameters
+        ----------
+        store: ConfigStore
+            Store the guild configs are loaded from and written to.
+        fallback: bool
+            True if store stands in for the configured store, journals are not compacted then.
+        """
+        self.store = store
+        self.fallback = fallback
+        guild_ids = await self.bot.loop.run_in_executor(
+            None, lambda: store.guild_ids() | self.bot.journal.guild_ids())
+        self.__guild_ids.update(str(guild_id) for guild_id in guild_ids)
+
+    async def ensure(self, guild_id: int) -> Optional[dict]:
+        """
+        Loads config of guild if it is not loaded and marks it as used.
+
+        Parameters
+        ----------
+        guild_id: int
+            ID of the guild.
+
+        Returns
+        -------
+        Config of guild, None if it has none
+        """
+        key = str(guild_id)
+        guild_config = self.__configs.get(key)
+        if guild_config is not None:
+            self.__configs.move_to_end(key)
+            return guild_config
+        if key not in self.__guild_ids:
+            return None
+        future = self.__loading.get(key)
+        if future is None:
+            future = self.__loading[key] = asyncio.ensure_future(self.__load(guild_id))
+        return await asyncio.shield(future)
+
+    async def reload(self, guild_id: int):
+        """
+        Drops config of guild and loads it again, eg after another worker changed it.
+        """
+        self.__guild_ids.add(str(guild_id))
+        self.evict(guild_id)
+        await self.ensure(guild_id)
+
+    def resize(self, guild_id: int, delta: int):
+        """
+        Adjusts size of guild's config by delta bytes after it was changed in place. Called by the Journal
+        for every commit with the size of the committed values, the config is not estimated again.
+        """
+        key = str(guild_id)
+        if key in self.__configs:
+            self.__insert(key, self.__configs[key], self.__sizes[key] + delta)
+
+    def is_unavailable(self, guild_id: int) -> bool:
+        """
+        Returns True if the guild has a config that could not be loaded from the store, it must not
+        be treated as a guild without config then.
+        """
+        return str(guild_id) in self.__unavailable
+
+    def hold(self, guild_id: int):
+        self.__held[guild_id] = self.__held.get(guild_id, 0) + 1
+
+    def release(self, guild_id: int):
+        count = self.__held.pop(guild_id, 0) - 1
+        if count > 0:
+            self.__held[guild_id] = count
+
+    def evict(self, guild_id: int):
+        key = str(guild_id)
+        if self.__configs.pop(key, None) is None:
+            return
+        self.bytes -= self.__sizes.pop(key)
+        self.evictions += 1
+        self.bot.compiled_limits.pop(guild_id, None)
+        self.bot.window_scheduler.set_guild(guild_id, [])
+        self.bot.check_cache.invalidate(guild_id)
+
+    def __getitem__(self, key: str) -> dict:
+        if key == "bot":
+            if self.__bot_config is None:
+                raise KeyError(key)
+            return self.__bot_config
+        guild_config = self.__configs.get(key)
+        if guild_config is not None:
+            self.__configs.move_to_end(key)
+            return guild_config
+        # not loaded, never read on the loop, callers that may see unloaded guilds await ensure() first
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, guild_config: Optional[dict]):
+        """
+        Setting a guild's config to None removes it, eg when a first setup is cancelled.
+        """
+        if key == "bot":
+            self.__bot_config = guild_config
+        elif guild_config is None:
+            del self[key]
+        else:
+            self.__guild_ids.add(key)
+            self.__insert(key, guild_config, estimate_size(guild_config))
+
+    def __delitem__(self, key: str):
+        if key == "bot":
+            self.__bot_config = None
+            return
+        if key not in self.__guild_ids:
+            raise KeyError(key)
+        self.__guild_ids.discard(key)
+        self.evict(int(key))
+
+    def __contains__(self, key) -> bool:
+        if key == "bot":
+            return self.__bot_config is not None
+        return key in self.__guild_ids
+
+    def __iter__(self):
+        if self.__bot_config is not None:
+            yield "bot"
+        yield from list(self.__guild_ids)
+
+    def __len__(self) -> int:
+        return len(self.__guild_ids) + (self.__bot_config is not None)
+
+    async def __load(self, guild_id: int) -> Optional[dict]:
+        key = str(guild_id)
+        try:
+            try:
+                guild_config = await self.bot.loop.run_in_executor(None, self.__read, guild_id)
+            except FileNotFoundError:
+                self.__guild_ids.discard(key)
+                return None
+            except STORE_ERRORS as exc:
+                self.__unavailable_on(guild_id, exc)
+                return None
+            except Exception as exc:
+                self.__corrupt(key, exc)
+                return None
+            self.__unavailable.discard(key)
+            # read on the loop meanwhile, possibly changed since
+            if key in self.__configs:
+                return self.__configs[key]
+            size = await self.bot.loop.run_in_executor(None, estimate_size, guild_config)
+            self.__insert(key, guild_config, size)
+            await permissions.compile_guild(self.bot, guild_id)
+            return guild_config
+        finally:
+            del self.__loading[key]
+
+    def __read(self, guild_id: int) -> dict:
+        self.loads += 1
+        return self.bot.journal.load(guild_id)
+
+    def __unavailable_on(self, guild_id: int, exc: Exception):
+        # the guild keeps its ID, nothing is cached and the next ensure() loads again
+        print(exc)
+        key = str(guild_id)
+        if key not in self.__unavailable:
+            self.__unavailable.add(key)
+            # outcomes checked before the failure would say the guild is not configured
+            self.bot.check_cache.invalidate(guild_id)
+
+    def __corrupt(self, key: str, exc: Exception):
+        # corrupt json or journal, the guild is treated as not configured until it is set up again
+        print(exc)
+        self.__guild_ids.discard(key)
+        self.__unavailable.discard(key)
+        if key not in self.bot.corrupt_configs:
+            self.bot.corrupt_configs.append(key)
+
+    def __insert(self, key: str, guild_config: dict, size: int):
+        self.bytes += size - self.__sizes.get(key, 0)
+        self.__sizes[key] = size
+        self.__configs[key] = guild_config
+        self.__configs.move_to_end(key)
+        if self.bytes > self.max_bytes:
+            self.__evict_idle()
+
+    def __evict_idle(self):
+        # the most recently used config stays, whatever its size
+        for key in list(self.__configs)[:-1]:
+            if self.bytes <= self.max_bytes:
+                break
+            guild_id = int(key)
+            if guild_id in self.__held or self.bot.journal.is_staged(guild_id) \
+                    or self.bot.config_writer.is_pending(guild_id):
+                continue
+            self.evict(guild_id)
+
+
+def add_listeners(bot):
+    """
+    Registers event listeners holding configs of guilds while their commands run, discarding changes
+    commands did not save and evicting configs of guilds the bot left.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    """
+    async def on_command(ctx):
+        if ctx.guild is not None:
+            bot.config.hold(ctx.guild.id)
+            ctx.config_held = True
+
+    async def release(ctx):
+        batch = getattr(ctx, "journal_batch", None)
+        if batch is not None and len(batch.entries) > 0:
+            # changes of a command that ended without saving them are not kept
+            await bot.journal.discard(batch)
+        # errors are also dispatched for messages that never reached on_command
+        if getattr(ctx, "config_held", False):
+            ctx.config_held = False
+            bot.config.release(ctx.guild.id)
+
+    async def on_command_completion(ctx):
+        await release(ctx)
+
+    async def on_command_error(ctx, error):
+        await release(ctx)
+
+    async def on_guild_remove(guild: discord.Guild):
+        bot.config.evict(guild.id)
+
+    bot.add_listener(on_command)
+    bot.add_listener(on_command_completion)
+    bot.add_listener(on_command_error)
+    bot.add_listener(on_guild_remove)
@@ -0,0 +1,180 @@
+import time
+import weakref
+from typing import Optional
+
+import discord
+
+from helpers.configview import ConfigView, get_config_view
+
+# until the option defaults are loaded
+DEFAULT_PREFIX = "!"
+# marks a node in which a prefix ends
+TERMINAL = None
+
+
+class PrefixTrie:
+    """
+    Character trie over a set of prefixes.
+
+    Matching walks at most as many characters as the longest prefix has,
+    no matter how many prefixes there are. The longest matching prefix wins.
+    """
+    __slots__ = ("prefixes", "root", "__weakref__")
+
+    def __init__(self, prefixes: tuple):
+        self.prefixes = prefixes
+        self.root = {}
+        for prefix in prefixes:
+            node = self.root
+            for char in prefix:
+                node = node.setdefault(char, {})
+            node[TERMINAL] = True
+
+    def match(self, content: str) -> Optional[str]:
+        node = self.root
+        length = 0
+        for index, char in enumerate(content):
+            node = node.get(char)
+            if node is None:
+                break
+            if TERMINAL in node:
+                length = index + 1
+        return content[:length] if length > 0 else None
+
+
+def get_prefixes(config_view: ConfigView) -> list:
+    """
+    Returns the guild's configured prefixes, or the default ones. A single prefix may be stored as string.
+
+    Parameters
+    ----------
+    config_view: ConfigView
+    """
+    prefixes = config_view.get("general", "command_prefix")
+    if not prefixes:
+        return [DEFAULT_PREFIX]
+    if isinstance(prefixes, str):
+        return [prefixes]
+    return [prefix for prefix in prefixes if prefix]
+
+
+def primary_prefix(bot, guild_id: int) -> str:
+    """
+    Returns the first configured prefix of guild, eg for usage hints in embeds.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    guild_id: int
+        ID of the guild.
+    """
+    return get_prefixes(get_config_view(bot, guild_id))[0]
+
+
+class Intake:
+    """
+    Pre-filter for incoming messages, runs before discord.py builds a Context.
+
+    Drops messages by bots and messages that do not start with one of the guild's prefixes.
+    Prefix tries are indexed by integer guild ID and updated by compile_guild whenever a
+    guild's config changes, so the filter never touches the config itself. Guilds with
+    identical prefix sets share one trie.
+    """
+    def __init__(self):
+        self.default_trie = PrefixTrie((DEFAULT_PREFIX,))
+        self.guild_tries = {}
+        self.shared_tries = weakref.WeakValueDictionary()
+        self.received = 0
+        self.filtered_bots = 0
+        self.filtered_prefix = 0
+        self.started = time.monotonic()
+        self.last_report = (self.started, 0)
+
+    def accept(self, message: discord.Message) -> bool:
+        self.received += 1
+        if message.author.bot:
+            self.filtered_bots += 1
+            return False
+        if self.get_prefix(message) is None:
+            self.filtered_prefix += 1
+            return False
+        return True
+
+    def get_trie(self, message: discord.Message) -> PrefixTrie:
+        guild = message.guild
+        return self.guild_tries.get(guild.id, self.default_trie) if guild is not None else self.default_trie
+
+    def get_prefix(self, message: discord.Message) -> Optional[str]:
+        """
+        Returns the prefix the message starts with, None if it starts with none of the guild's prefixes.
+        """
+        return self.get_trie(message).match(message.content)
+
+    def compile_default(self, option_defaults: dict):
+        """
+        Compiles the trie of guilds without config from the option defaults.
+
+        Parameters
+        ----------
+        option_defaults: dict
+            Defaults from configview.compile_defaults.
+        """
+        self.default_trie = self.__get_trie(tuple(sorted(set(get_prefixes(ConfigView(None, option_defaults))))))
+
+    def compile_guild(self, guild_id: int, config_view: ConfigView, user_id: Optional[int]):
+        """
+        Parameters
+        ----------
+        guild_id: int
+        config_view: ConfigView
+            Config of the guild over the option defaults.
+        user_id: Optional[int]
+            ID of the bot user, needed for mention prefixes.
+        """
+        prefixes = set(get_prefixes(config_view))
+        if config_view.get("general", "mention_prefix") and user_id is not None:
+            prefixes.update(("<@" + str(user_id) + "> ", "<@!" + str(user_id) + "> "))
+        self.guild_tries[guild_id] = self.__get_trie(tuple(sorted(prefixes)))
+
+    def __get_trie(self, key: tuple) -> PrefixTrie:
+        trie = self.shared_tries.get(key)
+        if trie is None:
+            trie = self.shared_tries[key] = PrefixTrie(key)
+        return trie
+
+    def remove_guild(self, guild_id: int):
+        self.guild_tries.pop(guild_id, None)
+
+    def report(self) -> dict:
+        """
+        Returns intake statistics, rates since start and since the previous report.
+        """
+        now = time.monotonic()
+        last_time, last_received = self.last_report
+        self.last_report = (now, self.received)
+        filtered = self.filtered_bots + self.filtered_prefix
+        return {
+            "received": self.received,
+            "filtered_bots": self.filtered_bots,
+            "filtered_prefix": self.filtered_prefix,
+            "filtered_fraction": filtered / self.received if self.received > 0 else 0.0,
+            "rate_total": self.received / (now - self.started),
+            "rate_recent": (self.received - last_received) / (now - last_time),
+            "tries": len(self.shared_tries)
+        }
+
+
+def add_listeners(bot):
+    """
+    Registers event listeners dropping prefixes of guilds the bot left.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    """
+    async def on_guild_remove(guild: discord.Guild):
+        bot.intake.remove_guild(guild.id)
+
+    bot.add_listener(on_guild_remove)
@@ -0,0 +1,264 @@
+import asyncio
+import copy
+import json
+import os
+import time
+from typing import Any, Optional
+
+from helpers import cluster, permissions
+from helpers.configstore import STORE_ERRORS
+from helpers.guildconfigs import estimate_size
+
+JOURNAL_DIRECTORY = "config/journal/"
+
+
+def get_path(guild_id: int) -> str:
+    return JOURNAL_DIRECTORY + str(guild_id) + ".jsonl"
+
+
+def get_audit_path(guild_id: int) -> str:
+    return JOURNAL_DIRECTORY + str(guild_id) + ".audit.jsonl"
+
+
+def apply_entry(guild_config: Optional[dict], entry: dict) -> Optional[dict]:
+    """
+    Applies journal entry to guild config, an empty path replaces the whole config.
+
+    Returns
+    -------
+    Guild config with entry applied
+    """
+    path = entry["path"]
+    if len(path) == 0:
+        return entry["new"]
+    if guild_config is None:
+        guild_config = {}
+    parent = guild_config
+    for key in path[:-1]:
+        parent = parent.setdefault(key, {})
+    if entry["new"] is None:
+        parent.pop(path[-1], None)
+    else:
+        parent[path[-1]] = entry["new"]
+    return guild_config
+
+
+def get_batch(ctx) -> "Batch":
+    """
+    Returns the batch of the invocation of ctx, begun on its first mutation.
+    Everything a command changes is committed or discarded together, other invocations are not affected.
+    """
+    batch = getattr(ctx, "journal_batch", None)
+    if batch is None:
+        batch = ctx.journal_batch = ctx.bot.journal.begin(ctx.guild.id)
+    return batch
+
+
+class Batch:
+    """
+    Mutations of a guild's config staged by one invocation.
+    """
+    def __init__(self, guild_id: int):
+        self.guild_id = guild_id
+        self.entries = []
+
+
+class Journal:
+    """
+    Append-only log of config mutations per guild, on top of the guild's snapshot in the config store.
+
+    Mutations are recorded with their path, old and new value, author and time. They are staged in
+    the batch of the invocation that made them until it saves the config, then appended to the guild's
+    journal in one write, so saving costs
+    the size of the changes instead of the size of the config. A guild's config is its snapshot
+    with its journal replayed on top. Once a journal has compact_entries entries, the guild is saved
+    through the ConfigWriter, which batches snapshots of all guilds due, and the entries the written
+    snapshot contains move to the guild's audit log. Journals are not compacted while the config store
+    falls back to files.
+    """
+    def __init__(self, bot, compact_entries: int):
+        self.bot = bot
+        self.compact_entries = compact_entries
+        self.__staged = {}
+        self.__counts = {}
+        self.__locks = {}
+        self.__compacting = set()
+        os.makedirs(JOURNAL_DIRECTORY, exist_ok=True)
+
+    def begin(self, guild_id: int) -> Batch:
+        return Batch(guild_id)
+
+    def record(self, batch: Batch, path: tuple, old: Any, new: Any, author_id: Optional[int]):
+        """
+        Stages mutation of guild config in batch. Old and new value must be copies, they are serialized on save.
+        """
+        batch.entries.append({"path": list(path), "old": old, "new": new, "author": author_id, "at": time.time()})
+        self.__staged.setdefault(batch.guild_id, set()).add(batch)
+
+    async def discard(self, batch: Batch):
+        """
+        Drops staged mutations of batch, eg when a setup is cancelled. The guild's config is loaded again
+        from its snapshot and journal with the mutations other batches staged meanwhile applied on top.
+        """
+        self.__unstage(batch)
+        entries = batch.entries
+        batch.entries = []
+        if len(entries) == 0:
+            return
+        guild_id = batch.guild_id
+        try:
+            async with self.__get_lock(guild_id):
+                guild_config = await self.bot.loop.run_in_executor(None, self.__load_committed, guild_id)
+        except (ValueError, STORE_ERRORS) as exc:
+            # loaded again on next use, staged mutations of other batches are only in their entries until then
+            print(exc)
+            self.bot.config.evict(guild_id)
+            return
+        staged = [entry for other in self.__staged.get(guild_id, ()) for entry in other.entries]
+        for entry in sorted(staged, key=lambda staged_entry: staged_entry["at"]):
+            # the config is changed in place later on, the staged entry must keep its value until it is committed
+            guild_config = apply_entry(guild_config, {"path": entry["path"], "new": copy.deepcopy(entry["new"])})
+        # a first setup that is discarded leaves no config at all, which removes the guild
+        self.bot.config[str(guild_id)] = guild_config
+        await permissions.compile_guild(self.bot, guild_id)
+
+    async def commit(self, batch: Batch) -> bool:
+        """
+        Appends staged mutations of batch to the guild's journal and compacts the journal if it is due.
+        Mutations that could not be written are reverted.
+
+        Returns
+        -------
+        True if the mutations were written
+        """
+        guild_id = batch.guild_id
+        entries = batch.entries
+        if len(entries) == 0:
+            return True
+        lines = "".join(json.dumps(entry) + "\n" for entry in entries).encode()
+        try:
+            async with self.__get_lock(guild_id):
+                await self.bot.loop.run_in_executor(None, self.__append, guild_id, lines)
+        except OSError as exc:
+            print(exc)
+            await self.discard(batch)
+            return False
+        self.__unstage(batch)
+        batch.entries = []
+        self.__counts[guild_id] = self.__counts.get(guild_id, 0) + len(entries)
+        # estimated from the changed values only, the config may be large
+        self.bot.config.resize(guild_id, sum(estimate_size(entry["new"]) - estimate_size(entry["old"])
+                                             for entry in entries))
+        await cluster.publish_config(self.bot, guild_id)
+        if self.__counts[guild_id] >= self.compact_entries:
+            self.bot.loop.create_task(self.compact(guild_id))
+        return True
+
+    async def compact(self, guild_id: int):
+        """
+        Writes a new snapshot of guild and moves the journal entries it contains to the audit log.
+        """
+        if self.__counts.get(guild_id, 0) == 0 or guild_id in self.__compacting:
+            return
+        # a snapshot in the fallback store would not reach the configured store, the journal keeps the changes
+        if self.bot.config.fallback:
+            return
+        self.__compacting.add(guild_id)
+        try:
+            # the ConfigWriter counts the entries when it takes the snapshot, later ones stay in the journal
+            count = await self.bot.config_writer.save(guild_id)
+            if not count:
+                return
+            async with self.__get_lock(guild_id):
+                await self.bot.loop.run_in_executor(None, self.__truncate, guild_id, count)
+            self.__counts[guild_id] -= count
+        except OSError as exc:
+            print(exc)
+        finally:
+            self.__compacting.discard(guild_id)
+
+    def entries(self, guild_id: int) -> int:
+        """
+        Returns number of entries in the guild's journal.
+        """
+        return self.__counts.get(guild_id, 0)
+
+    def load(self, guild_id: int) -> dict:
+        """
+        Loads snapshot of guild and replays its journal. Blocking, the GuildConfigs run it in the default executor.
+
+        Raises
+        ------
+        FileNotFoundError
+            Neither snapshot nor journal exist.
+        ValueError
+            Snapshot or journal are corrupt.
+        """
+        guild_config = None
+        content = self.bot.config.store.read(guild_id)
+        if content is not None:
+            guild_config = json.loads(content)
+            self.bot.config_writer.remember(guild_id, content)
+        count = 0
+        try:
+            with open(get_path(guild_id), 'r') as journal_file:
+                for line in journal_file:
+                    guild_config = apply_entry(guild_config, json.loads(line))
+                    count += 1
+        except FileNotFoundError:
+            pass
+        self.__counts[guild_id] = count
+        if guild_config is None:
+            raise FileNotFoundError(get_path(guild_id))
+        return guild_config
+
+    def __load_committed(self, guild_id: int) -> Optional[dict]:
+        try:
+            return self.load(guild_id)
+        except FileNotFoundError:
+            return None
+
+    def is_staged(self, guild_id: int) -> bool:
+        """
+        Returns True if an invocation has uncommitted mutations of the guild's config.
+        """
+        return guild_id in self.__staged
+
+    def __unstage(self, batch: Batch):
+        batches = self.__staged.get(batch.guild_id)
+        if batches is not None:
+            batches.discard(batch)
+            if len(batches) == 0:
+                del self.__staged[batch.guild_id]
+
+    @staticmethod
+    def guild_ids() -> set:
+        """
+        Returns IDs of guilds with a journal, guilds configured since the last compaction have no snapshot yet.
+        """
+        return {int(entry.name[:-6]) for entry in os.scandir(JOURNAL_DIRECTORY)
+                if entry.name.endswith(".jsonl") and entry.name[:-6].isdigit()}
+
+    def __get_lock(self, guild_id: int) -> asyncio.Lock:
+        return self.__locks.setdefault(guild_id, asyncio.Lock())
+
+    @staticmethod
+    def __append(guild_id: int, lines: bytes):
+        with open(get_path(guild_id), 'ab') as journal_file:
+            journal_file.write(lines)
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+
+    @staticmethod
+    def __truncate(guild_id: int, count: int):
+        path = get_path(guild_id)
+        with open(path, 'rb') as journal_file:
+            lines = journal_file.readlines()
+        with open(get_audit_path(guild_id), 'ab') as audit_file:
+            audit_file.writelines(lines[:count])
+        temp_path = path + ".tmp"
+        with open(temp_path, 'wb') as journal_file:
+            journal_file.writelines(lines[count:])
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        os.replace(temp_path, path)
@@ -0,0 +1,64 @@
+import discord
+
+from helpers import general, roles
+
+
+def compile_guild(bot, guild_id: int) -> int:
+    """
+    (Re)compiles mask of the guild's moderator roles from its config.
+    Called by permissions.compile_guild, so it follows every config change.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    guild_id: int
+        ID of the guild.
+
+    Returns
+    -------
+    Moderator roles mask, 0 if the guild has no moderator role
+    """
+    mod_roles = general.deep_get_sync(bot.config, str(guild_id), "essential_roles", "mod_role")
+    if mod_roles is None:
+        mod_roles = []
+    elif not isinstance(mod_roles, list):
+        mod_roles = [mod_roles]
+    mask = bot.mod_masks[guild_id] = roles.get_index(bot, guild_id).mask(mod_roles)
+    return mask
+
+
+def get_mod_mask(bot, guild_id: int) -> int:
+    """
+    Returns mask of the guild's moderator roles, compiles it if it does not exist yet.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    guild_id: int
+        ID of the guild.
+    """
+    mask = bot.mod_masks.get(guild_id)
+    if mask is None:
+        mask = compile_guild(bot, guild_id)
+    return mask
+
+
+def is_moderator(bot, member: discord.Member) -> bool:
+    """
+    Returns True if member has one of the guild's moderator roles.
+
+    Both masks are cached: the member's roles mask until the member's roles change,
+    the moderator mask until the guild's config changes. Cheap enough to call anywhere.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    member: discord.Member
+    """
+    if not isinstance(member, discord.Member):
+        return False
+    mod_mask = get_mod_mask(bot, member.guild.id)
+    return mod_mask != 0 and roles.member_mask(bot, member) & mod_mask != 0
@@ -0,0 +1,198 @@
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from discord.ext.commands import Command
+
+from helpers import general, roles, schedules, moderators, dispatch
+from helpers.configview import ConfigView, get_config_view
+from helpers.cooldowns import BucketType
+
+
+@dataclass(frozen=True)
+class Cooldown:
+    """
+    Compiled cooldown of a category or command: rate usages per seconds, per user, channel, or guild.
+    """
+    outer_scope: str
+    name: str
+    bucket_type: BucketType
+    rate: int
+    per: float
+
+
+@dataclass(frozen=True)
+class CommandLimits:
+    """
+    Immutable decision record for one command in one guild.
+
+    Compiled from the guild's limits tree by compile_guild and replaced as a whole whenever
+    the guild's configuration changes. global_check only ever reads these.
+    Role masks use the bit positions of the guild's RoleIndex.
+    Schedules are window boundaries from schedules.compile_windows, empty if always available.
+    """
+    name: str
+    category: str
+    skip_global_check: bool
+    skip_enable_check: bool
+    bot_enabled: Any
+    mods_override: bool
+    category_enabled: bool
+    command_enabled: bool
+    category_role_whitelist: frozenset
+    category_role_blacklist: frozenset
+    channel_whitelist: frozenset
+    channel_blacklist: frozenset
+    role_whitelist: frozenset
+    role_blacklist: frozenset
+    category_role_whitelist_mask: int
+    category_role_blacklist_mask: int
+    role_whitelist_mask: int
+    role_blacklist_mask: int
+    cooldowns: tuple
+    category_windows: tuple
+    category_schedule: tuple
+    command_windows: tuple
+    command_schedule: tuple
+
+
+def get_command_limits(bot, guild_id: int, command: Command) -> CommandLimits:
+    """
+    Returns compiled limits for command in guild.
+    Compiles the command if it has not been compiled yet (eg extension loaded after configs).
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    guild_id: int
+        ID of the guild.
+    command: Command
+        Command that is being invoked.
+    """
+    guild_limits = bot.compiled_limits.get(guild_id)
+    if guild_limits is not None:
+        command_limits = guild_limits.get(command.name)
+        if command_limits is not None:
+            return command_limits
+    else:
+        guild_limits = bot.compiled_limits.setdefault(guild_id, {})
+    command_limits = compile_command(bot, guild_id, bot.config.get(str(guild_id)), command)
+    guild_limits[command.name] = command_limits
+    bot.window_scheduler.add_boundaries(guild_id, command_limits.category_schedule + command_limits.command_schedule)
+    return command_limits
+
+
+async def compile_guild(bot, guild_id: int):
+    """
+    (Re)compiles limits of all commands for guild and invalidates its cached check outcomes.
+    Must be called whenever the guild's config changes.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    guild_id: int
+        ID of the guild.
+    """
+    guild_limits = compile_config(bot, guild_id, bot.config.get(str(guild_id)))
+    boundaries = set()
+    for command_limits in guild_limits.values():
+        boundaries.update(command_limits.category_schedule, command_limits.command_schedule)
+    bot.compiled_limits[guild_id] = guild_limits
+    moderators.compile_guild(bot, guild_id)
+    dispatch.compile_guild(bot, guild_id)
+    bot.intake.compile_guild(guild_id, get_config_view(bot, guild_id), bot.user.id if bot.user is not None else None)
+    bot.window_scheduler.set_guild(guild_id, list(boundaries))
+    bot.check_cache.invalidate(guild_id)
+
+
+def compile_config(bot, guild_id: int, guild_config: Optional[dict]) -> dict:
+    """
+    Compiles limits of all commands from guild config without storing them,
+    eg to compare a proposed config with the current one.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    guild_id: int
+        ID of the guild, needed for its role index.
+    guild_config: Optional[dict]
+        Configuration of the guild, None if not configured.
+
+    Returns
+    -------
+    Dictionary of command name to CommandLimits
+    """
+    return {command.name: compile_command(bot, guild_id, guild_config, command) for command in bot.commands}
+
+
+def compile_command(bot, guild_id: int, guild_config: Optional[dict], command: Command) -> CommandLimits:
+    """
+    Compiles limits of a single command from guild config.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    guild_id: int
+        ID of the guild, needed for its role index.
+    guild_config: Optional[dict]
+        Configuration of the guild, None if not configured.
+    command: Command
+        Command to compile limits for.
+    """
+    bot_limits = bot.config["bot"]["limits"]
+    category = command.cog_name.lower() if command.cog_name is not None else ""
+
+    limits_cat = general.deep_get_sync(guild_config, "limits", "categories")
+    limits_com = general.deep_get_sync(guild_config, "limits", "commands")
+
+    com_role_wl = general.deep_get_type_sync(list, limits_com, command.name, "roles", "whitelist")
+    com_role_bl = general.deep_get_type_sync(list, limits_com, command.name, "roles", "blacklist")
+
+    # Category role limits do not apply if the command has role limits of its own
+    if limits_cat is not None and len(com_role_wl) + len(com_role_bl) == 0:
+        cat_role_wl = general.deep_get_type_sync(list, limits_cat, category, "roles", "whitelist")
+        cat_role_bl = general.deep_get_type_sync(list, limits_cat, category, "roles", "blacklist")
+    else:
+        cat_role_wl = cat_role_bl = []
+
+    role_index = roles.get_index(bot, guild_id)
+
+    cooldowns = []
+    for outer_scope_str, name, limits_outer in (("categories", category, limits_cat), ("commands", command.name, limits_com)):
+        for bucket_type in BucketType:
+            cooldown = general.deep_get_type_sync(dict, limits_outer, name, "cooldowns", bucket_type.value)
+            if cooldown.get("rate", 0) > 0 and cooldown.get("per", 0) > 0:
+                cooldowns.append(Cooldown(outer_scope_str, name, bucket_type, cooldown["rate"], cooldown["per"]))
+
+    cat_windows = general.deep_get_type_sync(list, limits_cat, category, "schedule")
+    com_windows = general.deep_get_type_sync(list, limits_com, command.name, "schedule")
+
+    return CommandLimits(
+        name=command.name,
+        category=category,
+        skip_global_check=command.name in bot_limits["no_global_check"],
+        skip_enable_check=command.name in bot_limits["no_enable_check"],
+        # not resolved through the defaults, a guild without this value has not been set up
+        bot_enabled=general.deep_get_sync(guild_config, "general", "enabled"),
+        mods_override=bool(ConfigView(guild_config, bot.option_defaults).get("general", "mods_override_limits")),
+        category_enabled=general.deep_get_sync(limits_cat, category, "enabled") is not False,
+        command_enabled=general.deep_get_sync(limits_com, command.name, "enabled") is not False,
+        category_role_whitelist=frozenset(cat_role_wl),
+        category_role_blacklist=frozenset(cat_role_bl),
+        channel_whitelist=frozenset(general.deep_get_type_sync(list, limits_com, command.name, "channels", "whitelist")),
+        channel_blacklist=frozenset(general.deep_get_type_sync(list, limits_com, command.name, "channels", "blacklist")),
+        role_whitelist=frozenset(com_role_wl),
+        role_blacklist=frozenset(com_role_bl),
+        category_role_whitelist_mask=role_index.mask(cat_role_wl),
+        category_role_blacklist_mask=role_index.mask(cat_role_bl),
+        role_whitelist_mask=role_index.mask(com_role_wl),
+        role_blacklist_mask=role_index.mask(com_role_bl),
+        cooldowns=tuple(cooldowns),
+        category_windows=tuple(cat_windows),
+        category_schedule=schedules.compile_windows(cat_windows),
+        command_windows=tuple(com_windows),
+        command_schedule=schedules.compile_windows(com_windows)
+    )
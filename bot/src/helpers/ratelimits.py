@@ -0,0 +1,185 @@
+import asyncio
+import re
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import aiohttp
+
+# Discord's global limit per token, requests per second
+GLOBAL_RATE = 50
+# IDs of channels, guilds and webhooks are major parameters, they get their own buckets
+MAJOR_PARAMETER = re.compile(r"^/api/v\d+/(channels|guilds|webhooks)/(\d+)")
+SNOWFLAKE = re.compile(r"\d{15,}")
+# seconds a request waits for the coordinator before it is sent anyway
+ACQUIRE_TIMEOUT = 1.0
+
+
+def bucket_key(method: str, path: str) -> str:
+    """
+    Returns key of the rate limit bucket a request is counted against, approximated from its route.
+    """
+    major = MAJOR_PARAMETER.match(path)
+    if major is not None:
+        prefix_length = major.end()
+        return method + " " + path[:prefix_length] + SNOWFLAKE.sub("{id}", path[prefix_length:])
+    return method + " " + SNOWFLAKE.sub("{id}", path)
+
+
+@dataclass
+class Bucket:
+    limit: Optional[int] = None
+    # free requests in the window ending at reset_at, the latest window requests are reserved in
+    remaining: int = 0
+    reset_at: float = 0.0
+    # longest X-RateLimit-Reset-After seen, the length of the bucket's window
+    window: float = 0.0
+
+
+class RateLimiter:
+    """
+    Rate limit state of all processes sharing a token, kept by the coordinator.
+
+    Every request reserves a slot of the global limit and one remaining use of its bucket.
+    Buckets learn their limits from the headers of responses reported by the processes;
+    buckets never reported on are not limited here, discord.py still handles their 429s.
+    Once a bucket is used up, requests are reserved in the windows after it, limit per window,
+    and reports only update the window they are about.
+    """
+    def __init__(self, global_rate: int = GLOBAL_RATE):
+        self.interval = 1 / global_rate
+        self.global_next = 0.0
+        self.global_until = 0.0
+        self.buckets = {}
+
+    def acquire(self, key: str, now: float = None) -> float:
+        """
+        Reserves a request in bucket.
+
+        Returns
+        -------
+        Seconds the request has to wait before it is sent
+        """
+        now = time.monotonic() if now is None else now
+        start = max(now, self.global_until)
+        bucket = self.buckets.get(key)
+        if bucket is not None:
+            # a bucket whose limit was never reported is assumed to allow one request per window
+            limit = bucket.limit or 1
+            if bucket.reset_at <= start:
+                # windows passed unused, a new one starts with this request
+                bucket.reset_at = start + bucket.window
+                bucket.remaining = limit
+            elif bucket.remaining <= 0:
+                bucket.reset_at += bucket.window
+                bucket.remaining = limit
+            bucket.remaining -= 1
+            start = max(start, bucket.reset_at - bucket.window)
+        start = max(start, self.global_next)
+        self.global_next = start + self.interval
+        return start - now
+
+    def report(self, key: str, limit: Optional[int], remaining: Optional[int], reset_after: Optional[float],
+               global_retry_after: Optional[float], now: float = None):
+        """
+        Updates state from the headers of a response.
+
+        Parameters
+        ----------
+        key: str
+            Key of the bucket.
+        limit: Optional[int]
+            X-RateLimit-Limit, requests per window of bucket.
+        remaining: Optional[int]
+            X-RateLimit-Remaining, requests left in bucket.
+        reset_after: Optional[float]
+            X-RateLimit-Reset-After, seconds until the bucket resets.
+        global_retry_after: Optional[float]
+            Retry-After of a global 429, all requests are held back that long.
+        """
+        now = time.monotonic() if now is None else now
+        if global_retry_after is not None:
+            self.global_until = max(self.global_until, now + global_retry_after)
+        if remaining is not None and reset_after is not None:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = Bucket()
+            if limit is not None:
+                bucket.limit = limit
+            bucket.window = max(bucket.window, reset_after, self.interval)
+            reset_at = now + reset_after
+            # reset times of the same window differ by the latency of their responses
+            tolerance = bucket.window / 2
+            if reset_at > bucket.reset_at + tolerance:
+                bucket.remaining = remaining
+                bucket.reset_at = reset_at
+            elif reset_at >= bucket.reset_at - tolerance:
+                # requests reserved but not sent yet are not counted in the response
+                bucket.remaining = min(bucket.remaining, remaining)
+            # else the report is about a window before those requests are reserved in
+        # drop buckets that reset long ago, routes with IDs create lots of them
+        if len(self.buckets) > 10000:
+            self.buckets = {key: bucket for key, bucket in self.buckets.items() if bucket.reset_at > now}
+
+
+def get_trace_config(cluster) -> aiohttp.TraceConfig:
+    """
+    Returns aiohttp trace config holding back requests to the Discord API until the coordinator
+    allows them and reporting rate limit headers of their responses.
+
+    Parameters
+    ----------
+    cluster: ClusterClient
+        Connection to the coordinator.
+    """
+    async def on_request_start(session, context, params: aiohttp.TraceRequestStartParams):
+        if not params.url.path.startswith("/api/"):
+            return
+        context.bucket = bucket_key(params.method, params.url.path)
+        response = await cluster.request({"op": "acquire", "bucket": context.bucket}, ACQUIRE_TIMEOUT)
+        if response is not None and response["delay"] > 0:
+            await asyncio.sleep(response["delay"])
+
+    async def on_request_end(session, context, params: aiohttp.TraceRequestEndParams):
+        if not params.url.path.startswith("/api/"):
+            return
+        headers = params.response.headers
+        global_retry_after = None
+        if params.response.status == 429 and headers.get("X-RateLimit-Global"):
+            global_retry_after = float(headers.get("Retry-After", 1))
+        limit = headers.get("X-RateLimit-Limit")
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_after = headers.get("X-RateLimit-Reset-After")
+        await cluster.send({"op": "report", "bucket": context.bucket,
+                            "limit": int(limit) if limit is not None else None,
+                            "remaining": int(remaining) if remaining is not None else None,
+                            "reset_after": float(reset_after) if reset_after is not None else None,
+                            "global_retry_after": global_retry_after})
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.freeze()
+    return trace_config
+
+
+def add_listeners(bot):
+    """
+    Registers event listeners attaching the coordinator's rate limits to discord.py's HTTP session.
+    discord.py creates the session on login and recreates it when reconnecting, so it is checked on every connect.
+    Requests sent during login itself are not coordinated.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    """
+    trace_config = get_trace_config(bot.cluster)
+
+    async def on_connect():
+        bot.cluster.start()
+        session = bot.http._HTTPClient__session
+        if trace_config not in session.trace_configs:
+            session.trace_configs.append(trace_config)
+
+    bot.add_listener(on_connect)
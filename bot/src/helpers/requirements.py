@@ -0,0 +1,105 @@
+import importlib
+from dataclasses import dataclass, field
+from typing import Iterable
+
+import discord
+
+# Member cache flags only work with these intents enabled
+MEMBER_CACHE_INTENTS = {"online": "presences", "voice": "voice_states", "joined": "members"}
+
+
+@dataclass(frozen=True)
+class Requirements:
+    """
+    Gateway intents and caches an extension needs, declared as REQUIREMENTS in its commands module.
+
+    Names are attribute names of discord.Intents and discord.MemberCacheFlags.
+    """
+    intents: frozenset = field(default_factory=frozenset)
+    member_cache: frozenset = field(default_factory=frozenset)
+    chunk_guilds: bool = False
+
+
+# Needed by the bot itself: guild, role and channel cache, commands in guilds and DMs
+CORE = Requirements(intents=frozenset({"guilds", "guild_messages", "dm_messages"}))
+# Assumed for extensions that do not declare their requirements
+EVERYTHING = Requirements(intents=frozenset(name for name, _ in discord.Intents.all()),
+                          member_cache=frozenset(name for name, _ in discord.MemberCacheFlags.all()),
+                          chunk_guilds=True)
+
+
+def collect(extension_names: Iterable[str]) -> dict:
+    """
+    Imports the commands module of every extension and reads its REQUIREMENTS.
+    Extensions that fail to import are left out, load_extensions reports them later.
+
+    Parameters
+    ----------
+    extension_names: Iterable[str]
+        Folder names in extensions.
+
+    Returns
+    -------
+    Dictionary of extension name to Requirements
+    """
+    collected = {}
+    for name in extension_names:
+        try:
+            module = importlib.import_module("extensions." + name + ".commands")
+        except Exception as exc:
+            print(exc)
+            continue
+        collected[name] = getattr(module, "REQUIREMENTS", EVERYTHING)
+    return collected
+
+
+def resolve(requirements: Iterable[Requirements]) -> tuple:
+    """
+    Computes the minimal intents, member cache flags, and chunking covering all requirements.
+
+    Parameters
+    ----------
+    requirements: Iterable[Requirements]
+
+    Returns
+    -------
+    Tuple of discord.Intents, discord.MemberCacheFlags, and chunk_guilds_at_startup
+    """
+    intent_names = set(CORE.intents)
+    member_cache_names = set(CORE.member_cache)
+    chunk_guilds = CORE.chunk_guilds
+    for requirement in requirements:
+        intent_names.update(requirement.intents)
+        member_cache_names.update(requirement.member_cache)
+        chunk_guilds = chunk_guilds or requirement.chunk_guilds
+    if "voice" in member_cache_names and "online" in member_cache_names:
+        # discord.py needs joined to evict members cached for either
+        member_cache_names.add("joined")
+    intent_names.update(MEMBER_CACHE_INTENTS[name] for name in member_cache_names)
+    if chunk_guilds:
+        intent_names.add("members")
+
+    intents = discord.Intents.none()
+    for name in intent_names:
+        setattr(intents, name, True)
+    member_cache_flags = discord.MemberCacheFlags.none()
+    for name in member_cache_names:
+        setattr(member_cache_flags, name, True)
+    return intents, member_cache_flags, chunk_guilds
+
+
+def print_report(collected: dict, intents: discord.Intents, member_cache_flags: discord.MemberCacheFlags,
+                 chunk_guilds: bool):
+    """
+    Prints which extension needs what and which intents and caches are disabled.
+    """
+    for name, requirement in sorted(collected.items()):
+        if requirement is EVERYTHING:
+            print("Extension " + name + " does not declare requirements, enabling everything")
+        else:
+            print("Extension " + name + " requires intents: " + (", ".join(sorted(requirement.intents)) or "-"))
+    disabled_intents = [name for name, enabled in intents if not enabled]
+    disabled_caches = [name for name, enabled in member_cache_flags if not enabled]
+    print("Disabled intents: " + (", ".join(disabled_intents) or "-"))
+    print("Disabled member caches: " + (", ".join(disabled_caches) or "-"))
+    print("Member chunking at startup: " + ("enabled" if chunk_guilds else "disabled"))
@@ -0,0 +1,78 @@
+import json
+import os
+import time
+from typing import Optional
+
+
+def get_state_path(bot) -> str:
+    # every worker of a cluster shuts down on its own
+    if bot.cluster is not None and bot.cluster.cluster_id is not None:
+        return "config/restart_" + str(bot.cluster.cluster_id) + ".json"
+    return "config/restart.json"
+
+
+def load_state(bot) -> Optional[dict]:
+    """
+    Loads state saved by the previous run on shutdown and removes it, so that a crash of this run
+    is not mistaken for a clean shutdown.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+
+    Returns
+    -------
+    State of previous run, None if it did not shut down cleanly
+    """
+    path = get_state_path(bot)
+    try:
+        with open(path, 'r') as json_file:
+            state = json.load(json_file)
+    except (OSError, ValueError):
+        return None
+    os.remove(path)
+    return state
+
+
+def is_quiet_restart(bot, state: Optional[dict]) -> bool:
+    """
+    Returns True if the previous run shut down cleanly shortly before and ran the same version.
+    Guilds are not greeted again after such restarts.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    state: Optional[dict]
+        State of the previous run from load_state.
+    """
+    if state is None:
+        return False
+    quiet_seconds = bot.config["bot"]["restart"]["quiet_seconds"]
+    return state.get("version") == bot.version and time.time() - state.get("stopped_at", 0) < quiet_seconds
+
+
+async def shutdown(bot):
+    """
+    Shuts down cleanly: flushes pending writes, saves state for the next run and closes the connection.
+    Bound to SIGTERM and SIGINT, eg docker stop.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    """
+    print("Shutting down")
+    await bot.config_writer.flush()
+    bot.config.store.close()
+    if hasattr(bot, "message_log"):
+        await bot.message_log.flush()
+    # only runs that got through startup have a version
+    if hasattr(bot, "version"):
+        try:
+            with open(get_state_path(bot), 'w') as json_file:
+                json.dump({"version": bot.version, "stopped_at": time.time()}, json_file)
+        except OSError as exc:
+            print(exc)
+    await bot.close()
@@ -0,0 +1,152 @@
+from collections import OrderedDict
+from typing import Iterable
+
+import discord
+
+# members whose masks are cached per guild, the least recently used are dropped beyond that
+MAX_MEMBERS = 1024
+
+
+class RoleIndex:
+    """
+    Maps role IDs of a guild to bit positions and caches each member's roles as int bitmask.
+
+    Bit positions are handed out on first sight and never reassigned while the index exists,
+    so masks compiled into limits stay valid when roles are created or deleted.
+
+    Cached member masks are checked against the member's current role IDs. Member update and remove
+    events are only sent for members in discord.py's member cache, which may be disabled (see requirements),
+    so the cache is bounded to the MAX_MEMBERS members that used it last.
+    """
+    __slots__ = ("bits", "members")
+
+    def __init__(self):
+        self.bits = {}
+        # least recently used first
+        self.members = OrderedDict()
+
+    def bit(self, role_id: int) -> int:
+        bit = self.bits.get(role_id)
+        if bit is None:
+            bit = self.bits[role_id] = 1 << len(self.bits)
+        return bit
+
+    def mask(self, role_ids: Iterable[int]) -> int:
+        mask = 0
+        for role_id in role_ids:
+            mask |= self.bit(role_id)
+        return mask
+
+    def member_mask(self, member: discord.Member) -> int:
+        # discord.py has no public accessor for a member's role IDs. member.roles resolves every ID
+        # to a Role and sorts them on each call, which is what this cache exists to avoid, so the
+        # IDs discord.py keeps for the member are read directly. They are copied into a tuple,
+        # the cached entry must not change along with the member.
+        role_ids = getattr(member, "_roles", None)
+        role_ids = tuple(role_ids) if role_ids is not None else tuple(role.id for role in member.roles)
+        entry = self.members.get(member.id)
+        if entry is not None and entry[0] == role_ids:
+            self.members.move_to_end(member.id)
+            return entry[1]
+        mask = self.mask(role_ids)
+        self.members[member.id] = (role_ids, mask)
+        self.members.move_to_end(member.id)
+        if len(self.members) > MAX_MEMBERS:
+            self.members.popitem(last=False)
+        return mask
+
+
+def get_index(bot, guild_id: int) -> RoleIndex:
+    """
+    Returns role index of guild, creates it if it does not exist yet.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    guild_id: int
+        ID of the guild.
+    """
+    index = bot.role_indexes.get(guild_id)
+    if index is None:
+        index = bot.role_indexes[guild_id] = RoleIndex()
+    return index
+
+
+def member_mask(bot, member: discord.Member) -> int:
+    """
+    Returns bitmask of the member's roles.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    member: discord.Member
+        Member to get roles bitmask for.
+    """
+    return get_index(bot, member.guild.id).member_mask(member)
+
+
+def roles_in_mask(member: discord.Member, role_ids: frozenset) -> list:
+    """
+    Returns the member's roles that are part of role_ids, in the member's role order.
+    Only meant for building error details after a mask check failed.
+
+    Parameters
+    ----------
+    member: discord.Member
+    role_ids: frozenset
+    """
+    return [role for role in member.roles if role.id in role_ids]
+
+
+def add_listeners(bot):
+    """
+    Registers event listeners keeping role indexes up to date.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    """
+    async def on_member_update(before: discord.Member, after: discord.Member):
+        if before.roles != after.roles:
+            await forget_member(bot, after.guild.id, after.id)
+
+    async def on_member_remove(member: discord.Member):
+        await forget_member(bot, member.guild.id, member.id)
+
+    async def on_guild_role_delete(role: discord.Role):
+        # Discord does not send member updates when one of their roles is deleted
+        index = bot.role_indexes.get(role.guild.id)
+        if index is not None:
+            index.members.clear()
+
+    async def on_guild_remove(guild: discord.Guild):
+        # compiled limits hold masks of this index, drop them along with it
+        bot.role_indexes.pop(guild.id, None)
+        bot.compiled_limits.pop(guild.id, None)
+        bot.mod_masks.pop(guild.id, None)
+
+    bot.add_listener(on_member_update)
+    bot.add_listener(on_member_remove)
+    bot.add_listener(on_guild_role_delete)
+    bot.add_listener(on_guild_remove)
+
+
+async def forget_member(bot, guild_id: int, member_id: int):
+    """
+    Drops cached roles bitmask of member, it is rebuilt on next access.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    guild_id: int
+        ID of the guild.
+    member_id: int
+        ID of the member.
+    """
+    index = bot.role_indexes.get(guild_id)
+    if index is not None:
+        index.members.pop(member_id, None)
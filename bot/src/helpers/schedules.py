@@ -0,0 +1,235 @@
+import asyncio
+import heapq
+import time
+from bisect import bisect_right
+from typing import Optional
+
+DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+DAY_GROUPS = {"daily": range(0, 7), "weekdays": range(0, 5), "weekends": range(5, 7)}
+DAY = 86400
+WEEK = 7 * DAY
+# 1970-01-01 was a Thursday
+EPOCH_WEEKDAY = 3
+
+
+def parse_days(token: str) -> Optional[list]:
+    """
+    Parses day specification, eg "mon", "mon-fri", "sat,sun", "weekends", or "daily".
+    Returns sorted list of weekdays (0 = Monday), None if invalid.
+
+    Parameters
+    ----------
+    token: str
+    """
+    days = set()
+    for part in token.lower().split(","):
+        if part in DAY_GROUPS:
+            days.update(DAY_GROUPS[part])
+        elif "-" in part:
+            first, _, last = part.partition("-")
+            if first not in DAYS or last not in DAYS:
+                return None
+            day = DAYS.index(first)
+            days.add(day)
+            while day != DAYS.index(last):
+                day = (day + 1) % 7
+                days.add(day)
+        elif part in DAYS:
+            days.add(DAYS.index(part))
+        else:
+            return None
+    return sorted(days)
+
+
+def parse_time_range(token: str) -> Optional[tuple]:
+    """
+    Parses time range, eg "18:00-22:00". Ranges ending before they start continue on the next day.
+    Returns start and end in seconds since midnight, None if invalid.
+
+    Parameters
+    ----------
+    token: str
+    """
+    times = []
+    for part in token.split("-"):
+        hours, _, minutes = part.partition(":")
+        if not hours.isdigit() or not minutes.isdigit():
+            return None
+        seconds = int(hours) * 3600 + int(minutes) * 60
+        if int(minutes) > 59 or seconds > DAY:
+            return None
+        times.append(seconds)
+    if len(times) != 2 or times[0] == times[1]:
+        return None
+    if times[1] < times[0]:
+        times[1] += DAY
+    return times[0], times[1]
+
+
+def parse_windows(tokens: list) -> Optional[list]:
+    """
+    Parses list of tokens into normalised window strings, eg ["mon-fri", "18:00-22:00", "12:00-13:00"]
+    to ["mon-fri 18:00-22:00", "daily 12:00-13:00"]. A time range without days applies daily.
+    Returns None if any token is invalid.
+
+    Parameters
+    ----------
+    tokens: list
+    """
+    windows = []
+    days = None
+    for token in tokens:
+        token = token.lower()
+        if parse_time_range(token) is not None:
+            windows.append((days if days is not None else "daily") + " " + token)
+            days = None
+        elif days is None and parse_days(token) is not None:
+            days = token
+        else:
+            return None
+    return windows if days is None else None
+
+
+def compile_windows(windows: list) -> tuple:
+    """
+    Compiles window strings into sorted boundaries in seconds of the week (UTC).
+    Boundaries alternate between opening and closing, so a point in time is inside
+    a window if an odd number of boundaries lie at or before it.
+
+    Parameters
+    ----------
+    windows: list
+        Window strings as created by parse_windows. Invalid ones are ignored.
+    """
+    intervals = []
+    for window in windows:
+        days_token, _, time_token = window.partition(" ")
+        days = parse_days(days_token)
+        time_range = parse_time_range(time_token)
+        if days is None or time_range is None:
+            continue
+        for day in days:
+            start = day * DAY + time_range[0]
+            end = day * DAY + time_range[1]
+            if end > WEEK:
+                intervals.append((0, end - WEEK))
+                end = WEEK
+            intervals.append((start, end))
+    intervals.sort()
+
+    boundaries = []
+    for start, end in intervals:
+        if boundaries and start <= boundaries[-1]:
+            boundaries[-1] = max(boundaries[-1], end)
+        else:
+            boundaries.extend((start, end))
+    return tuple(boundaries)
+
+
+def second_of_week(timestamp: float) -> float:
+    return (timestamp + EPOCH_WEEKDAY * DAY) % WEEK
+
+
+def is_open(boundaries: tuple, timestamp: float = None) -> bool:
+    """
+    Returns True if timestamp lies inside the compiled windows.
+
+    Parameters
+    ----------
+    boundaries: tuple
+        Boundaries from compile_windows, must not be empty.
+    timestamp: float, optional
+        Unix timestamp, defaults to now.
+    """
+    return bisect_right(boundaries, second_of_week(time.time() if timestamp is None else timestamp)) & 1 == 1
+
+
+def next_transition(boundaries: tuple, timestamp: float) -> float:
+    """
+    Returns unix timestamp of the first boundary after timestamp.
+
+    Parameters
+    ----------
+    boundaries: tuple
+        Boundaries from compile_windows, must not be empty.
+    timestamp: float
+    """
+    second = second_of_week(timestamp)
+    index = bisect_right(boundaries, second)
+    if index < len(boundaries):
+        return timestamp + boundaries[index] - second
+    return timestamp + WEEK - second + boundaries[0]
+
+
+class WindowScheduler:
+    """
+    Single task driving window transitions of all guilds.
+
+    Keeps one heap entry per guild with windows, sleeps until the earliest transition and
+    invalidates that guild's cached check outcomes when it is reached. Guilds cost nothing
+    between transitions, no matter how many of them have windows.
+    """
+    def __init__(self, bot):
+        self.bot = bot
+        self.__heap = []
+        self.__boundaries = {}
+        self.__scheduled = {}
+        self.__wakeup = None
+        self.__task = None
+
+    def start(self):
+        if self.__task is None:
+            self.__wakeup = asyncio.Event()
+            self.__task = self.bot.loop.create_task(self.__run())
+
+    def set_guild(self, guild_id: int, boundaries: list):
+        """
+        Replaces all boundaries of guild. Guilds without boundaries are unscheduled.
+        """
+        if len(boundaries) == 0:
+            self.__boundaries.pop(guild_id, None)
+            self.__scheduled.pop(guild_id, None)
+            return
+        boundaries = tuple(sorted(set(boundaries)))
+        # limits are compiled again and again with the same windows, the scheduled transition stays valid
+        if self.__boundaries.get(guild_id) == boundaries:
+            return
+        self.__boundaries[guild_id] = boundaries
+        self.__schedule(guild_id, time.time())
+
+    def add_boundaries(self, guild_id: int, boundaries: tuple):
+        current = self.__boundaries.get(guild_id, ())
+        if any(boundary not in current for boundary in boundaries):
+            self.set_guild(guild_id, list(current) + list(boundaries))
+
+    def __len__(self):
+        return len(self.__boundaries)
+
+    def __schedule(self, guild_id: int, timestamp: float):
+        when = next_transition(self.__boundaries[guild_id], timestamp)
+        self.__scheduled[guild_id] = when
+        heapq.heappush(self.__heap, (when, guild_id))
+        # entries replaced by set_guild stay until their time, drop them once they outnumber the valid ones
+        if len(self.__heap) > 2 * len(self.__scheduled) + 64:
+            self.__heap = [(when, guild_id) for guild_id, when in self.__scheduled.items()]
+            heapq.heapify(self.__heap)
+        if self.__wakeup is not None and self.__heap[0][1] == guild_id:
+            self.__wakeup.set()
+
+    async def __run(self):
+        while True:
+            now = time.time()
+            while self.__heap and self.__heap[0][0] <= now:
+                when, guild_id = heapq.heappop(self.__heap)
+                # entries replaced by set_guild are skipped
+                if self.__scheduled.get(guild_id) != when:
+                    continue
+                self.bot.check_cache.invalidate(guild_id)
+                self.bot.dispatch("limits_window_transition", guild_id)
+                self.__schedule(guild_id, when)
+            timeout = self.__heap[0][0] - now if self.__heap else None
+            self.__wakeup.clear()
+            try:
+                await asyncio.wait_for(self.__wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,162 @@
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+import discord
+
+from helpers import schedules
+from helpers.permissions import CommandLimits
+
+
+class InvocationLog:
+    """
+    Compact per-guild log of command invocations for shadow evaluation.
+
+    Invocations are counted per (time bucket, command, channel, roles mask) instead of stored
+    one by one. Bursts of the same command in the same channel by members with the same roles
+    collapse into a single counter, so a day of traffic usually fits into a few thousand entries.
+    Buckets older than the retention are dropped as new ones are opened.
+    """
+    def __init__(self, bucket_seconds: int, hours: int):
+        """
+        Parameters
+        ----------
+        bucket_seconds: int
+            Width of a time bucket. Schedules are evaluated at the start of the bucket.
+        hours: int
+            Hours of traffic kept.
+        """
+        self.bucket_seconds = bucket_seconds
+        self.hours = hours
+        self.__guilds = {}
+
+    def record(self, guild_id: int, command_name: str, channel_id: int, roles_mask: int, now: float = None):
+        bucket = int(time.time() if now is None else now) // self.bucket_seconds * self.bucket_seconds
+        buckets = self.__guilds.get(guild_id)
+        if buckets is None:
+            buckets = self.__guilds[guild_id] = {}
+        counter = buckets.get(bucket)
+        if counter is None:
+            counter = buckets[bucket] = Counter()
+            oldest = bucket - self.hours * 3600
+            for expired in [expired for expired in buckets if expired <= oldest]:
+                del buckets[expired]
+        counter[(command_name, channel_id, roles_mask)] += 1
+
+    def window(self, guild_id: int, hours: int, now: float = None) -> list:
+        """
+        Returns list of (bucket start, Counter) of the last hours of guild.
+        """
+        oldest = (time.time() if now is None else now) - hours * 3600
+        buckets = self.__guilds.get(guild_id, {})
+        return [(bucket, counter) for bucket, counter in buckets.items() if bucket + self.bucket_seconds > oldest]
+
+    def count(self, guild_id: int) -> int:
+        return sum(sum(counter.values()) for counter in self.__guilds.get(guild_id, {}).values())
+
+    def remove_guild(self, guild_id: int):
+        self.__guilds.pop(guild_id, None)
+
+
+def evaluate(limits: CommandLimits, channel_id: int, roles_mask: int, mod_mask: int, timestamp: float) -> Optional[str]:
+    """
+    Evaluates compiled limits for a recorded invocation without Discord objects.
+    Mirrors the stages in checks.STAGES and must be kept in line with them.
+
+    Returns
+    -------
+    Name of the stage that rejected, None if the invocation is allowed
+    """
+    if limits.skip_global_check:
+        return None
+    if limits.bot_enabled is None or limits.bot_enabled is False and not limits.skip_enable_check:
+        return "bot_enabled"
+    if limits.mods_override and roles_mask & mod_mask:
+        return None
+    if not limits.category_enabled:
+        return "category_enabled"
+    if limits.category_schedule and not schedules.is_open(limits.category_schedule, timestamp):
+        return "category_schedule"
+    if roles_mask & limits.category_role_blacklist_mask \
+            or limits.category_role_whitelist_mask and not roles_mask & limits.category_role_whitelist_mask:
+        return "category_roles"
+    if not limits.command_enabled:
+        return "command_enabled"
+    if limits.command_schedule and not schedules.is_open(limits.command_schedule, timestamp):
+        return "command_schedule"
+    if limits.channel_whitelist and channel_id not in limits.channel_whitelist \
+            or channel_id in limits.channel_blacklist:
+        return "command_channels"
+    if roles_mask & limits.role_blacklist_mask \
+            or limits.role_whitelist_mask and not roles_mask & limits.role_whitelist_mask:
+        return "command_roles"
+    return None
+
+
+@dataclass
+class ShadowReport:
+    invocations: int = 0
+    combinations: int = 0
+    newly_denied: Counter = field(default_factory=Counter)
+    newly_allowed: Counter = field(default_factory=Counter)
+    seconds: float = 0.0
+
+
+def replay(window: list, current: dict, proposed: dict, mod_mask: int) -> ShadowReport:
+    """
+    Replays recorded invocations against current and proposed limits. Does not touch the log or the bot,
+    so it can run in the default executor on a copy of the window while the log keeps recording.
+
+    Parameters
+    ----------
+    window: list
+        (bucket start, Counter) of the invocations to replay, see InvocationLog.window.
+    current: dict
+        Command name to CommandLimits compiled from the current config.
+    proposed: dict
+        Command name to CommandLimits compiled from the proposed config.
+    mod_mask: int
+        Moderator roles mask of the guild.
+
+    Returns
+    -------
+    ShadowReport, flips are counted per command
+    """
+    start = time.perf_counter()
+    report = ShadowReport()
+    # only commands whose limits differ can flip, commands no longer loaded are missing from both
+    changed = {name: (limits, proposed[name]) for name, limits in current.items()
+               if name in proposed and limits != proposed[name]}
+    for bucket, counter in window:
+        for (command_name, channel_id, roles_mask), count in counter.items():
+            report.invocations += count
+            report.combinations += 1
+            pair = changed.get(command_name)
+            if pair is None:
+                continue
+            current_limits, proposed_limits = pair
+            allowed_before = evaluate(current_limits, channel_id, roles_mask, mod_mask, bucket) is None
+            allowed_after = evaluate(proposed_limits, channel_id, roles_mask, mod_mask, bucket) is None
+            if allowed_before and not allowed_after:
+                report.newly_denied[command_name] += count
+            elif allowed_after and not allowed_before:
+                report.newly_allowed[command_name] += count
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def add_listeners(bot):
+    """
+    Registers event listeners dropping logs of guilds the bot left.
+    Roles masks in the log are only valid with the guild's RoleIndex, which is dropped as well.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    """
+    async def on_guild_remove(guild: discord.Guild):
+        bot.invocation_log.remove_guild(guild.id)
+
+    bot.add_listener(on_guild_remove)
@@ -0,0 +1,99 @@
+import discord
+
+
+class GuildStageStats:
+    """
+    Per-stage counters of one guild plus the stage order derived from them.
+    """
+    __slots__ = ("checks", "calls", "rejections", "nanoseconds", "order")
+
+    def __init__(self, stage_count: int):
+        self.checks = 0
+        self.calls = [0] * stage_count
+        self.rejections = [0] * stage_count
+        self.nanoseconds = [0] * stage_count
+        self.order = tuple(range(stage_count))
+
+    def record(self, index: int, nanoseconds: int, rejected: bool):
+        self.calls[index] += 1
+        self.nanoseconds[index] += nanoseconds
+        if rejected:
+            self.rejections[index] += 1
+
+    def average_ns(self, index: int) -> float:
+        return self.nanoseconds[index] / self.calls[index] if self.calls[index] > 0 else 0.0
+
+    def rejection_rate(self, index: int) -> float:
+        return self.rejections[index] / self.calls[index] if self.calls[index] > 0 else 0.0
+
+    def reorder(self):
+        """
+        Sorts stages by expected cost per rejection, cheapest first.
+        Stages that have never run sort first, so that they get measured.
+        """
+        def score(index: int) -> float:
+            # add-one smoothing, a stage that never rejected still has a finite score
+            rate = (self.rejections[index] + 1) / (self.calls[index] + 2)
+            return self.average_ns(index) / rate
+        self.order = tuple(sorted(range(len(self.calls)), key=lambda index: (score(index), index)))
+
+
+class StageStats:
+    """
+    Instrumentation of the global_check stages, kept per guild.
+
+    In adaptive mode every guild evaluates its stages in its own order, recomputed
+    every reorder_interval checks. In fixed mode the order never changes, statistics
+    are still recorded so both modes can be compared.
+    """
+    def __init__(self, stage_names: tuple, order: str, reorder_interval: int):
+        """
+        Parameters
+        ----------
+        stage_names: tuple
+            Names of the stages in fixed order.
+        order: str
+            "fixed" or "adaptive".
+        reorder_interval: int
+            Number of checks after which adaptive order is recomputed.
+        """
+        self.stage_names = stage_names
+        self.adaptive = order == "adaptive"
+        self.reorder_interval = reorder_interval
+        self.fixed_order = tuple(range(len(stage_names)))
+        self.__guilds = {}
+
+    def get_guild(self, guild_id: int) -> GuildStageStats:
+        guild_stats = self.__guilds.get(guild_id)
+        if guild_stats is None:
+            guild_stats = self.__guilds[guild_id] = GuildStageStats(len(self.stage_names))
+        return guild_stats
+
+    def get_order(self, guild_stats: GuildStageStats) -> tuple:
+        return guild_stats.order if self.adaptive else self.fixed_order
+
+    def finish_check(self, guild_stats: GuildStageStats):
+        guild_stats.checks += 1
+        if self.adaptive and guild_stats.checks % self.reorder_interval == 0:
+            guild_stats.reorder()
+
+    def remove_guild(self, guild_id: int):
+        self.__guilds.pop(guild_id, None)
+
+    def guilds(self) -> list:
+        return list(self.__guilds.values())
+
+
+def add_listeners(bot):
+    """
+    Registers event listeners dropping statistics of guilds the bot left.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    """
+    async def on_guild_remove(guild: discord.Guild):
+        bot.stage_stats.remove_guild(guild.id)
+
+    bot.add_listener(on_guild_remove)
@@ -1,10 +1,10 @@
 import copy
-import json
 import os
 import platform
 
 import asyncio
 from enum import Enum
+from typing import Optional
 
 import discord
 from discord.ext import commands
@@ -13,7 +13,7 @@ from database import base as db
 from database.base import DatabaseVersionStatus
 from extensions.changelog.functions.addchangelog import save_changelog
 from extensions.config.helper import load_values
-from helpers import strings
+from helpers import strings, restarts, configstore
 
 
 class DatabaseStatus(Enum):
@@ -22,43 +22,93 @@ class DatabaseStatus(Enum):
     UPGRADED = 2
 
 
-async def startup_sequence(bot):
+async def startup_sequence(bot) -> tuple:
+    """
+    Loads everything that does not depend on guilds, runs once per process.
+    Shards becoming ready wait for it in shard_startup_sequence.
+
+    Returns
+    -------
+    Tuple of init embed, extended init embed and extended init message, which is None if the
+    main channel is not on one of this process's shards
+    """
+    bot.app_info = await bot.application_info()
+
     # prepare init embeds for both main and all other servers
     init_embed, init_embed_extended = await prepare_init_embeds(bot)
     init_message_extended = await send_init_message_extended(bot, init_embed_extended)
 
-    if init_message_extended is not None:
-        # Load values
-        values_status = await load_strings_and_values(bot)
-        await update_init_embed_extended(bot, "values", init_embed_extended, values_status)
-        await init_message_extended.edit(embed=init_embed_extended)
-
-        # Stop bot if any value file could not be loaded
-        if len(values_status) > 0:
-            raise SystemExit()
-
-        # Load extensions and update extended init message
-        failed_extensions = await load_extensions(bot)
-        await update_init_embed_extended(bot, "extensions", init_embed_extended, failed_extensions)
-        await init_message_extended.edit(embed=init_embed_extended)
-
-        # Check changelog, add to startup embed
-        await check_changelog(bot, init_embed, init_embed_extended)
-
-        # Load server configurations
-        configs = await load_configs(bot)
-        await update_init_embed_extended(bot, "configs", init_embed_extended, configs)
-        await init_message_extended.edit(embed=init_embed_extended)
-
-        bot.ready = True
-
-        status = await connect_database(bot)
-        await update_init_embed_extended(bot, "database", init_embed_extended, status)
-        await init_message_extended.edit(embed=init_embed_extended)
+    # Load values
+    values_status = await load_strings_and_values(bot)
+    await update_init_embed_extended(bot, "values", init_embed_extended, values_status)
+    await edit_init_message(init_message_extended, init_embed_extended)
+
+    # Stop bot if any value file could not be loaded
+    if len(values_status) > 0:
+        raise SystemExit()
+
+    # Load extensions and update extended init message
+    failed_extensions = await load_extensions(bot)
+    await update_init_embed_extended(bot, "extensions", init_embed_extended, failed_extensions)
+    await edit_init_message(init_message_extended, init_embed_extended)
+
+    # Check changelog, add to startup embed
+    await check_changelog(bot, init_embed, init_embed_extended)
+    bot.quiet_restart = restarts.is_quiet_restart(bot, bot.previous_run)
+
+    # Guilds' windows are added as their configs are loaded
+    bot.window_scheduler.start()
+    if bot.cluster is not None:
+        bot.cluster.start()
+
+    bot.ready = True
+
+    init_embed_extended.set_field_at(3, name="Database", value="⌛ Connecting...")
+    status = await connect_database(bot)
+    await update_init_embed_extended(bot, "database", init_embed_extended, status)
+    await edit_init_message(init_message_extended, init_embed_extended)
+
+    await attach_config_store(bot)
+
+    return init_embed, init_embed_extended, init_message_extended
+
+
+async def shard_startup_sequence(bot, shard_id: Optional[int]):
+    """
+    Checks configs of the shard's guilds and greets them, called whenever a shard becomes ready.
+    The first call starts startup_sequence, all calls wait for it.
+
+    Parameters
+    ----------
+    bot
+        The bot object.
+    shard_id: Optional[int]
+        ID of the shard, None if the bot is not sharded.
+    """
+    if bot.startup_task is None:
+        bot.startup_task = asyncio.ensure_future(startup_sequence(bot))
+    init_embed, init_embed_extended, init_message_extended = await bot.startup_task
+
+    guilds = [guild for guild in bot.guilds if guild.shard_id == shard_id]
+    first_ready = shard_id not in bot.ready_shards
+    configs = await find_missing_configs(bot, guilds)
+    if first_ready:
+        bot.missing_configs.extend(configs)
+    bot.ready_shards.add(shard_id)
+    print("Shard " + str(shard_id) + " ready with " + str(len(guilds)) + " guilds")
+
+    if first_ready:
+        shard_count = len(bot.shards) if isinstance(bot, discord.AutoShardedClient) else 1
+        if len(bot.ready_shards) < shard_count:
+            init_embed_extended.set_field_at(2, name="Configs", value="⌛ Loading... (" + str(len(bot.ready_shards))
+                                             + "/" + str(shard_count) + " shards)")
+        else:
+            await update_init_embed_extended(bot, "configs", init_embed_extended, bot.missing_configs)
+        await edit_init_message(init_message_extended, init_embed_extended)
 
-        # Send startup message on all servers
-        if bot.dev_session is False:
-            await send_startup_message(bot, init_embed)
+        # Send startup message on all servers of the shard
+        if bot.dev_session is False and bot.quiet_restart is False:
+            await send_startup_message(bot, init_embed, guilds)
 
 
 async def prepare_init_embeds(bot):
@@ -77,6 +127,11 @@ async def prepare_init_embeds(bot):
     return [init_embed, init_embed_extended]
 
 
+async def edit_init_message(init_message_extended: Optional[discord.Message], init_embed_extended: discord.Embed):
+    if init_message_extended is not None:
+        await init_message_extended.edit(embed=init_embed_extended)
+
+
 async def send_init_message_extended(bot, init_message_extended):
     channel = bot.get_channel(int(os.environ['MAIN_CHANNEL_ID']))
     if channel is not None:
@@ -120,7 +175,6 @@ async def update_init_embed_extended(bot, update_type, init_embed_extended, valu
             init_embed_extended.set_field_at(2, name="Configs", value="✅ Loaded")
         else:
             init_embed_extended.set_field_at(2, name="Configs", value="⚠ Failed")
-        init_embed_extended.set_field_at(3, name="Database", value="⌛ Connecting...")
 
     elif update_type == "database":
         if value == DatabaseStatus.FAILED:
@@ -135,13 +189,14 @@ async def update_init_embed_extended(bot, update_type, init_embed_extended, valu
     return init_embed_extended
 
 
+def get_extension_names() -> list:
+    return [f.name for f in os.scandir('extensions') if f.is_dir() and "pycache" not in f.name]
+
+
 async def load_extensions(bot):
     failed = []
 
-    subfolders = [f.name for f in os.scandir('extensions') if f.is_dir()]
-    for folder in subfolders:
-        if "pycache" in folder:
-            continue
+    for folder in get_extension_names():
         try:
             bot.load_extension("extensions." + folder + ".commands")
         except (commands.ExtensionNotFound, commands.ExtensionFailed, commands.NoEntryPointError) as exc:
@@ -158,22 +213,37 @@ async def load_strings_and_values(bot):
     return failed_strings
 
 
-async def load_configs(bot):
-    error_filenotfound_list = []
-
-    for guild in bot.guilds:
-        filename = str(guild.id)
-        try:
-            with open("config/" + filename + ".json", 'r') as json_file:
-                try:
-                    bot.config[filename] = json.load(json_file)
-                except ValueError:
-                    if filename not in bot.corrupt_configs:
-                        bot.corrupt_configs.append(filename)
-        except FileNotFoundError:
-            error_filenotfound_list.append(filename)
-
-    return error_filenotfound_list
+async def attach_config_store(bot):
+    """
+    Opens the config store set in config_store.backend, PostgreSQL falls back to files if the database
+    is not connected. A new store imports the config files on its first start, a store that cannot be
+    opened or imported into falls back to files too, startup must not fail on it. While on the fallback,
+    journals are not compacted, so the configured store gets every change replayed once it is back.
+    """
+    store_config = bot.config["bot"]["config_store"]
+    if store_config["backend"] == "postgresql" and bot.db_session is None:
+        print("Database not connected, guild configs fall back to files")
+    try:
+        store = configstore.create_store(store_config["backend"], bot.db_session, store_config["sqlite_path"])
+        if store.name != "file":
+            imported = await bot.loop.run_in_executor(None, store.import_from, configstore.FileStore())
+            if imported > 0:
+                print("Imported " + str(imported) + " config files into " + store.name)
+        await bot.config.attach(store, store.name != store_config["backend"])
+    except configstore.STORE_ERRORS as exc:
+        print(exc)
+        print("Config store " + store_config["backend"] + " failed, guild configs fall back to files")
+        store = configstore.FileStore()
+        await bot.config.attach(store, store_config["backend"] != "file")
+    print("Guild configs stored in " + store.name)
+
+
+async def find_missing_configs(bot, guilds: list) -> list:
+    """
+    Returns guilds without config. Configs themselves are loaded on first use, configs that
+    turn out to be corrupt are added to bot.corrupt_configs then.
+    """
+    return [str(guild.id) for guild in guilds if str(guild.id) not in bot.config]
 
 
 async def connect_database(bot) -> DatabaseStatus:
@@ -209,10 +279,10 @@ async def check_changelog(bot, init_embed, init_embed_extended):
         return init_embed, init_embed_extended
 
 
-async def send_startup_message(bot, init_embed):
-    for guild_id in bot.config:
-        if guild_id != "bot":
+async def send_startup_message(bot, init_embed, guilds: list):
+    for guild in guilds:
+        guild_config = await bot.config.ensure(guild.id)
+        if guild_config is not None:
             await asyncio.sleep(1)
-            guild = bot.get_guild(int(guild_id))
-            channel = guild.get_channel(bot.config[guild_id]["essential_channels"]["bot_channel"])
+            channel = guild.get_channel(guild_config["essential_channels"]["bot_channel"])
             await channel.send(embed=init_embed)
@@ -6,6 +6,9 @@ from discord.ext.commands import Context
 
 from helpers import general
 
+GUILD_LANGUAGE = general.compile_path("general", "language")
+GUILD_STYLE = general.compile_path("general", "style")
+
 
 class ReturnType(Enum):
     DEFAULT_LANGUAGE = 0
@@ -95,13 +98,13 @@ async def get_string(ctx: Context, category: str, name: str) -> String:
     """
 
     string = String(category, name)
-    lang = await get_guild_language(ctx, string)
-    style = await get_guild_style(ctx)
-    returned_string = await general.deep_get(ctx.bot.strings, string.category, string.name, lang, style)
+    lang = get_guild_language_sync(ctx, string)
+    style = get_guild_style_sync(ctx)
+    returned_string = general.deep_get_sync(ctx.bot.strings, string.category, string.name, lang, style)
     # Get string in default language if nothing found for specified one
     # TODO possibly fall back to default style before falling back to default lang
     if returned_string is None and lang != ctx.bot.default_language:
-        returned_string = await general.deep_get(ctx.bot.strings, string.category, string.name, ctx.bot.default_language, style)
+        returned_string = general.deep_get_sync(ctx.bot.strings, string.category, string.name, ctx.bot.default_language, style)
     if isinstance(returned_string, list):
         string.list = returned_string
     else:
@@ -116,6 +119,20 @@ async def get_guild_language(ctx: Context, string: String = None) -> str:
     Gets language for guild.
     Returns default language if run outside of a guild or if guild has no language set.
 
+    Parameters
+    -----------
+    ctx: discord.ext.commands.Context
+        Invocation context, needed to determine guild.
+    string: Optional[str]
+        Optional String dataclass. If provided, return type in this dataclass object is set.
+    """
+    return get_guild_language_sync(ctx, string)
+
+
+def get_guild_language_sync(ctx: Context, string: String = None) -> str:
+    """
+    Synchronous variant of get_guild_language for hot paths.
+
     Parameters
     -----------
     ctx: discord.ext.commands.Context
@@ -125,7 +142,7 @@ async def get_guild_language(ctx: Context, string: String = None) -> str:
     """
 
     if ctx.guild is not None:
-        lang = await general.deep_get(ctx.bot.config, str(ctx.guild.id), "general", "language")
+        lang = GUILD_LANGUAGE(ctx.bot.config.get(str(ctx.guild.id)))
     else:
         lang = None
     if lang is not None:
@@ -135,7 +152,7 @@ async def get_guild_language(ctx: Context, string: String = None) -> str:
     else:
         if string is not None:
             string.return_type = ReturnType.DEFAULT_LANGUAGE
-        default_language = await general.deep_get(ctx.bot.values["options"], "general", "list", "language", "default")
+        default_language = ctx.bot.option_defaults.get(("general", "language"))
         return default_language if default_language is not None else ctx.bot.default_language
 
 
@@ -144,6 +161,18 @@ async def get_guild_style(ctx: Context) -> str:
     Gets language style for guild.
     Returns default style if run outside of a guild or if guild has no language set.
 
+    Parameters
+    -----------
+    ctx: discord.ext.commands.Context
+        Invocation context, needed to determine guild.
+    """
+    return get_guild_style_sync(ctx)
+
+
+def get_guild_style_sync(ctx: Context) -> str:
+    """
+    Synchronous variant of get_guild_style for hot paths.
+
     Parameters
     -----------
     ctx: discord.ext.commands.Context
@@ -151,14 +180,14 @@ async def get_guild_style(ctx: Context) -> str:
     """
 
     if ctx.guild is not None:
-        style = await general.deep_get(ctx.bot.config, str(ctx.guild.id), "general", "style")
+        style = GUILD_STYLE(ctx.bot.config.get(str(ctx.guild.id)))
     else:
         style = None
     if style is not None:
         return style
     else:
         # TODO change default to amadeus once those have been created
-        return ctx.bot.values["options"]["general"]["list"]["style"]["default"]
+        return ctx.bot.option_defaults[("general", "style")]
 
 
 async def get_exception_strings(ctx: Context, ex_name: str) -> ExceptionString:
@@ -174,20 +203,20 @@ async def get_exception_strings(ctx: Context, ex_name: str) -> ExceptionString:
     """
 
     ex_string = ExceptionString(ex_name)
-    lang = await get_guild_language(ctx)
-    style = await get_guild_style(ctx)
-    exception = await general.deep_get(ctx.bot.exception_strings, ex_string.name)
+    lang = get_guild_language_sync(ctx)
+    style = get_guild_style_sync(ctx)
+    exception = ctx.bot.exception_strings.get(ex_string.name)
     if exception is not None:
         ex_string.successful = True
         # TODO possibly fall back to default style before falling back to default lang
-        ex_string.message = await general.deep_get(exception, "message", lang, style)
+        ex_string.message = general.deep_get_sync(exception, "message", lang, style)
         # Get string in default language if nothing found for specified one
         if ex_string.message is None and lang != ctx.bot.default_language:
-            ex_string.message = await general.deep_get(exception, "message", ctx.bot.default_language, style)
-        description = await general.deep_get(exception, "description", lang, style)
+            ex_string.message = general.deep_get_sync(exception, "message", ctx.bot.default_language, style)
+        description = general.deep_get_sync(exception, "description", lang, style)
         # Get string in default language if nothing found for specified one
         if description is None and lang != ctx.bot.default_language:
-            description = await general.deep_get(exception, "description", ctx.bot.default_language, style)
+            description = general.deep_get_sync(exception, "description", ctx.bot.default_language, style)
         ex_string.description = [description] if isinstance(description, str) else description
     return ex_string
 
@@ -205,15 +234,15 @@ async def extract_config_option_strings(ctx: Context, option_dict: dict) -> Opti
     """
 
     option_strings = OptionStrings()
-    lang = await get_guild_language(ctx)
-    option_strings.name = await general.deep_get(option_dict, "name", lang)
+    lang = get_guild_language_sync(ctx)
+    option_strings.name = general.deep_get_sync(option_dict, "name", lang)
     # Get string in default language if nothing found for specified on
     if option_strings.name is None and lang != ctx.bot.default_language:
-        option_strings.name = await general.deep_get(option_dict, "name", ctx.bot.default_language)
-    option_strings.description = await general.deep_get(option_dict, "description", lang)
+        option_strings.name = general.deep_get_sync(option_dict, "name", ctx.bot.default_language)
+    option_strings.description = general.deep_get_sync(option_dict, "description", lang)
     # Get string in default language if nothing found for specified on
     if option_strings.description is None and lang != ctx.bot.default_language:
-        option_strings.description = await general.deep_get(option_dict, "description", ctx.bot.default_language)
+        option_strings.description = general.deep_get_sync(option_dict, "description", ctx.bot.default_language)
     if option_strings.name is not None and option_strings.description is not None:
         option_strings.successful = True
     return option_strings